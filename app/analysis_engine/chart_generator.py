@@ -3,6 +3,8 @@
 from itertools import combinations
 from typing import Dict, Any
 
+import numpy as np
+
 
 def generate_chart_data(analysis_results: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -26,6 +28,7 @@ def generate_chart_data(analysis_results: Dict[str, Any]) -> Dict[str, Any]:
         return chart_data
 
     subjects = list(group_stats.get("correlationMatrix", {}).keys())  # 所有学科列表
+    subjects_with_total = subjects + ['totalScore']  # 学科及总分，各图表共用
     class_names = [t['tableName'] for t in tables]  # 所有班级名称
 
     # -----------------------------
@@ -35,7 +38,7 @@ def generate_chart_data(analysis_results: Dict[str, Any]) -> Dict[str, Any]:
     grade_charts["score_distribution_histogram"] = {}
 
     # 构建每个学科及总分的频率直方图数据
-    for subject in subjects + ['totalScore']:
+    for subject in subjects_with_total:
         if subject in group_stats and "frequencyDistribution" in group_stats[subject]:
             freq_dist = group_stats[subject]["frequencyDistribution"]
             grade_charts["score_distribution_histogram"][subject] = {
@@ -47,9 +50,14 @@ def generate_chart_data(analysis_results: Dict[str, Any]) -> Dict[str, Any]:
     # 构建相关性热力图数据
     if "correlationMatrix" in group_stats:
         corr_matrix = group_stats["correlationMatrix"]
+        corr_values = np.array(
+            [[corr_matrix[s1].get(s2, 0) for s2 in subjects] for s1 in subjects], dtype=np.float64
+        ).reshape(len(subjects), len(subjects))
+        # 行号 i 对应 y 轴、列号 j 对应 x 轴，按行优先展开为 [x, y, 值] 三元组
+        rows, cols = np.indices(corr_values.shape)
         heatmap_data = [
-            [j, i, corr_matrix[s1].get(s2, 0)]
-            for i, s1 in enumerate(subjects) for j, s2 in enumerate(subjects)
+            [j, i, value] for j, i, value in
+            zip(cols.ravel().tolist(), rows.ravel().tolist(), corr_values.ravel().tolist())
         ]
         grade_charts["subject_correlation_heatmap"] = {
             "x_axis_labels": subjects,
@@ -83,36 +91,38 @@ def generate_chart_data(analysis_results: Dict[str, Any]) -> Dict[str, Any]:
         "highAchieverPenetration", "academicCoreDensity"
     ]
 
+    # 将各班及年级的统计字典一次性整理为按指标存放的数组（SoA）：
+    # 行为各班级（最后一行为年级），列为各学科（最后一列为总分）
+    stats_rows = [table['tableStats'] for table in tables] + [group_stats]
+    metric_matrices = {
+        metric: np.array(
+            [[row_stats[subject].get(metric, 0) for subject in subjects_with_total] for row_stats in stats_rows],
+            dtype=np.float64
+        ) for metric in metrics_to_compare
+    }
+    box_plot_keys = ("min", "q1", "median", "q3", "max")
+    box_plot_tensor = np.array(
+        [[[row_stats[subject]['boxPlotData'][k] for k in box_plot_keys] for subject in subjects_with_total]
+         for row_stats in stats_rows],
+        dtype=np.float64
+    )
+
     # 构建柱状图数据（各指标对比）
     class_charts["metrics_bar_chart"] = {metric: {} for metric in metrics_to_compare}
     for metric in metrics_to_compare:
-        for subject in subjects + ['totalScore']:
-            series_data = [table['tableStats'][subject].get(metric, 0) for table in tables]
-            series_data_with_grade = series_data + [group_stats[subject].get(metric, 0)]
+        for subject_idx, subject in enumerate(subjects_with_total):
             class_charts["metrics_bar_chart"][metric][subject] = {
                 "categories": class_names + ['年级平均'],
-                "series_data": series_data_with_grade,
+                "series_data": metric_matrices[metric][:, subject_idx].tolist(),
                 "series_name": f"{subject} - {metric}"
             }
 
     # 构建箱线图数据（成绩分布）
     class_charts["score_distribution_boxplot"] = {}
-    for subject in subjects + ['totalScore']:
-        series_data = [[
-            table['tableStats'][subject]['boxPlotData']['min'],
-            table['tableStats'][subject]['boxPlotData']['q1'],
-            table['tableStats'][subject]['boxPlotData']['median'],
-            table['tableStats'][subject]['boxPlotData']['q3'],
-            table['tableStats'][subject]['boxPlotData']['max']
-        ] for table in tables]
-
-        gp_bp = group_stats[subject]['boxPlotData']
-        series_data.append([
-            gp_bp['min'], gp_bp['q1'], gp_bp['median'], gp_bp['q3'], gp_bp['max']
-        ])
+    for subject_idx, subject in enumerate(subjects_with_total):
         class_charts["score_distribution_boxplot"][subject] = {
             "categories": class_names + ['年级整体'],
-            "data": series_data,
+            "data": box_plot_tensor[:, subject_idx, :].tolist(),
             "title": f"{subject} 成绩分布箱线图"
         }
 
@@ -120,15 +130,16 @@ def generate_chart_data(analysis_results: Dict[str, Any]) -> Dict[str, Any]:
     class_charts["class_profile_radar"] = {}
     full_marks_map = analysis_results.get('fullMarks', {})
     radar_indicator = [{"name": s, "max": full_marks_map.get(s, 150)} for s in subjects]
+    subject_means = metric_matrices["mean"][:, :len(subjects)].tolist()
     grade_mean_series = {
         "name": "年级平均",
-        "value": [group_stats[s].get('mean', 0) for s in subjects]
+        "value": subject_means[-1]
     }
-    for table in tables:
+    for table_idx, table in enumerate(tables):
         class_name = table['tableName']
         class_mean_series = {
             "name": class_name,
-            "value": [table['tableStats'][s].get('mean', 0) for s in subjects]
+            "value": subject_means[table_idx]
         }
         class_charts["class_profile_radar"][class_name] = {
             "indicator": radar_indicator,
@@ -145,14 +156,20 @@ def generate_chart_data(analysis_results: Dict[str, Any]) -> Dict[str, Any]:
     # 展平所有学生数据
     all_students_flat = [student for table in tables for student in table['students']]
 
+    # 一次性构建 (学生数, 学科数) 的分数矩阵，各学科对直接按列取值，避免重复遍历嵌套字典
+    student_names = [s['studentName'] for s in all_students_flat]
+    student_tables = [s['tableName'] for s in all_students_flat]
+    score_matrix = np.array(
+        [[s['scores']['rawScores'].get(sub, 0) for sub in subjects] for s in all_students_flat], dtype=np.float64
+    ).reshape(len(all_students_flat), len(subjects))
+    score_columns = score_matrix.T.tolist()
+
     # 构建学科对学科的散点图数据
-    for sub1, sub2 in combinations(subjects, 2):
-        scatter_data = [[
-            s['scores']['rawScores'].get(sub1, 0),
-            s['scores']['rawScores'].get(sub2, 0),
-            s['studentName'],
-            s['tableName']
-        ] for s in all_students_flat]
+    for (i, sub1), (j, sub2) in combinations(enumerate(subjects), 2):
+        scatter_data = [
+            [x, y, name, table_name]
+            for x, y, name, table_name in zip(score_columns[i], score_columns[j], student_names, student_tables)
+        ]
         key = f"{sub1}_vs_{sub2}"
         student_charts["subject_vs_subject_scatter"][key] = {
             "data": scatter_data,
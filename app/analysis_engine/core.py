@@ -1,69 +1,125 @@
 import math
-import statistics
-from typing import Dict, List, Any
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# 分数序列类型：既可以是普通列表，也可以是预先转换好的 NumPy 数组
+ScoreArray = Union[Sequence[float], np.ndarray]
+
+
+def _tail_means(scores: ScoreArray, tail_n: int, is_sorted: bool = False) -> Tuple[float, float]:
+    """
+    计算最低 tail_n 个与最高 tail_n 个分数各自的平均值，返回 (低分组均值, 高分组均值)。
+
+    已排序的输入直接切片；否则用 np.partition 只把两端分出来（平均 O(n)），无需完整排序。
+    """
+    arr = np.asarray(scores, dtype=np.float64)
+    n = arr.size
+    if not is_sorted:
+        arr = np.partition(arr, sorted({tail_n - 1, n - tail_n}))
+    return float(arr[:tail_n].mean()), float(arr[n - tail_n:].mean())
 
 
 # ==============================================================================
 # --- 核心辅助与统计函数模块 ---
 # ==============================================================================
 
-def calculate_gini(arr: List[float]) -> float:
+def calculate_gini(arr: ScoreArray) -> float:
     """
     计算基尼系数，用于衡量分数分布的均衡性。
     值越接近 0 表示分布越平均，越接近 1 表示差异越大。
     """
-    if not arr or sum(arr) == 0:
+    values = np.asarray(arr, dtype=np.float64)
+    n = values.size
+    if n == 0:
+        return 0.0
+    # Σ(2i - n - 1)·x_i 等价于 (n + 1)·Σx - 2·Σ累计和，只需一次 cumsum，无需构造权重数组；
+    # 总和取自累计和末项，结果与输入顺序无关
+    cumulative = np.cumsum(np.sort(values))
+    total = cumulative[-1]
+    if total == 0:
         return 0.0
-    sorted_arr = sorted(arr)
-    n = len(sorted_arr)
-    numerator = sum((2 * (i + 1) - n - 1) * val for i, val in enumerate(sorted_arr))
-    denominator = n * sum(sorted_arr)
-    return float(numerator / denominator) if denominator != 0 else 0.0
+    numerator = (n + 1) * total - 2 * cumulative.sum()
+    return float(numerator / (n * total))
 
 
-def calculate_skewness_kurtosis(arr: List[float]) -> Dict[str, float]:
+def _skewness_kurtosis_from_moments(n: int, variance: float, m3: float, m4: float) -> Dict[str, float]:
     """
-    计算偏度（Skewness）和峰度（Kurtosis）指标。
-    偏度反映分布的对称性，峰度反映分布的尖峭程度。
+    由总体方差与三、四阶中心矩推导偏度和峰度（样本少于 4 个或方差为 0 时均记为 0）。
     """
-    n = len(arr)
-    if n < 4:
-        return {"skewness": 0.0, "kurtosis": 0.0}
-    mean = statistics.mean(arr)
-    try:
-        std_dev = statistics.pstdev(arr)
-    except statistics.StatisticsError:
+    if n < 4 or variance <= 0:
         return {"skewness": 0.0, "kurtosis": 0.0}
-    if std_dev == 0:
-        return {"skewness": 0.0, "kurtosis": 0.0}
-    m3 = sum((x - mean) ** 3 for x in arr) / n
-    m4 = sum((x - mean) ** 4 for x in arr) / n
+    std_dev = math.sqrt(variance)
     skewness = m3 / (std_dev ** 3)
     kurtosis = m4 / (std_dev ** 4) - 3
     return {"skewness": round(skewness, 3), "kurtosis": round(kurtosis, 3)}
 
 
-def calculate_correlation(arr1: List[float], arr2: List[float]) -> float:
+def calculate_gini_rows(rows: Sequence[Sequence[float]]) -> List[float]:
+    """
+    批量计算多组分数各自的基尼系数（例如全班每位学生的各科 T 分）。
+
+    各组长度一致时拼成矩阵按行排序，按行累计求和后一次得到所有分子；
+    长度不一致时逐组回退到 calculate_gini。
     """
-    计算两组分数的皮尔逊相关系数（Pearson Correlation Coefficient）。
-    用于度量两个变量之间的线性相关性。
+    if not rows:
+        return []
+    lengths = {len(row) for row in rows}
+    if len(lengths) != 1:
+        return [calculate_gini(row) for row in rows]
+
+    n = lengths.pop()
+    if n == 0:
+        return [0.0] * len(rows)
+    cumulative = np.cumsum(np.sort(np.asarray(rows, dtype=np.float64), axis=1), axis=1)
+    totals = cumulative[:, -1]
+    numerators = (n + 1) * totals - 2 * cumulative.sum(axis=1)
+    denominators = n * totals
+    safe_denominators = np.where(denominators != 0, denominators, 1.0)
+    return np.where(denominators != 0, numerators / safe_denominators, 0.0).tolist()
+
+
+def calculate_correlation_matrix(subject_scores: Dict[str, ScoreArray]) -> Dict[str, Dict[str, float]]:
     """
-    n = len(arr1)
-    if n < 2 or len(arr2) != n:
-        return 0.0
-    try:
-        mean1, mean2 = statistics.mean(arr1), statistics.mean(arr2)
-        std1, std2 = statistics.pstdev(arr1), statistics.pstdev(arr2)
-    except statistics.StatisticsError:
-        return 0.0
-    if std1 == 0 or std2 == 0:
-        return 0.0
-    covariance = sum((x1 - mean1) * (x2 - mean2) for x1, x2 in zip(arr1, arr2)) / n
-    correlation = covariance / (std1 * std2)
-    return round(correlation, 3)
+    一次性计算多个学科两两之间的皮尔逊相关系数矩阵。
+
+    将各科分数堆叠为 (学科数, 人数) 的矩阵后调用 np.corrcoef，
+    所有学科对共享同一轮均值与标准差计算，避免逐对重复扫描。
+    方差为 0 的学科与其他学科的相关系数记为 0。
+
+    :param subject_scores: 字典结构，键为学科名，值为按同一学生顺序排列的分数序列
+    :return: 嵌套字典 {学科1: {学科2: 相关系数}}，对角线恒为 1.0
+    """
+    subjects = list(subject_scores.keys())
+    if not subjects:
+        return {}
+
+    matrix = np.vstack([np.asarray(subject_scores[s], dtype=np.float64) for s in subjects])
+    if matrix.shape[1] < 2:
+        coefficients = np.zeros((len(subjects), len(subjects)))
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            coefficients = np.atleast_2d(np.corrcoef(matrix))
+        coefficients = np.nan_to_num(coefficients, nan=0.0)
+
+    return {
+        s1: {
+            s2: (1.0 if i == j else round(float(coefficients[i, j]), 3))
+            for j, s2 in enumerate(subjects)
+        } for i, s1 in enumerate(subjects)
+    }
 
 
-def calculate_frequency_distribution(scores: List[float], full_mark: float, bin_size: int = 10) -> Dict[str, int]:
+@lru_cache(maxsize=128)
+def _bin_labels(int_full_mark: int, bin_size: int) -> Tuple[str, ...]:
+    """
+    生成分数段标签（按数值顺序）。同一满分与跨度组合在各科目、各班级间反复出现，缓存后无需重复格式化字符串。
+    """
+    return tuple(f"{i}-{min(i + bin_size, int_full_mark)}" for i in range(0, int_full_mark, bin_size))
+
+
+def calculate_frequency_distribution(scores: ScoreArray, full_mark: float, bin_size: int = 10) -> Dict[str, int]:
     """
     计算分数频率分布，用于生成直方图数据。
 
@@ -75,44 +131,78 @@ def calculate_frequency_distribution(scores: List[float], full_mark: float, bin_
     # 稳定性增强：防止 bin_size 为 0 导致崩溃
     if bin_size <= 0:
         return {}
-    if not scores:
+    arr = np.asarray(scores, dtype=np.float64)
+    if arr.size == 0:
         return {}
 
-    bins = {}
-    int_full_mark = int(math.ceil(full_mark))
+    labels = _bin_labels(int(math.ceil(full_mark)), bin_size)
+    n_bins = len(labels)
+    if n_bins == 0:
+        return {}
 
-    # 初始化分数段容器
-    for i in range(0, int_full_mark, bin_size):
-        upper_bound = min(i + bin_size, int_full_mark)
-        bins[f"{i}-{upper_bound}"] = 0
+    # 向量化分档：满分归入最后一个分数段；越界分数被截断到两端的哨兵档位（-1 与 n_bins），
+    # 整体平移一位后统一计数再丢弃哨兵，避免逐元素分支与布尔筛选产生的额外拷贝
+    last_bin = n_bins - 1
+    bin_index = np.where(arr == full_mark, last_bin, np.floor_divide(arr, bin_size))
+    shifted_index = np.clip(bin_index, -1, n_bins).astype(np.int64) + 1
+    counts = np.bincount(shifted_index, minlength=n_bins + 2)[1:n_bins + 1]
 
-    # 获取最后一个分段的 key，用于处理满分边界
-    last_key = ""
-    if bins:
-        last_key = sorted(bins.keys())[-1]
+    return dict(zip(labels, counts.tolist()))
 
-    # 遍历分数分配到对应的 bin 中
-    for score in scores:
-        if score == full_mark and last_key:
-            bins[last_key] += 1
-            continue
-        bin_index = int(score // bin_size)
-        lower_bound = bin_index * bin_size
-        upper_bound = min(lower_bound + bin_size, int_full_mark)
-        key = f"{lower_bound}-{upper_bound}"
-        if key in bins:
-            bins[key] += 1
-
-    # 按数值顺序返回排序结果
-    return {k: v for k, v in sorted(bins.items(), key=lambda item: int(item[0].split('-')[0]))}
 
+def calculate_quartiles(values: ScoreArray) -> Tuple[float, float, float]:
+    """
+    计算 Q1、中位数、Q3，口径与 statistics.quantiles(n=4) 默认的 'exclusive' 方法一致。
 
-def calculate_descriptive_stats(scores_arr: List[float], full_mark: float) -> Dict[str, Any]:
+    只需要 6 个次序统计量，因此使用 np.partition（平均 O(n)）代替完整排序。
+    至少需要 2 个分数。
+    """
+    arr = np.asarray(values, dtype=np.float64)
+    n = arr.size
+    m = n + 1
+    positions = []
+    for i in range(1, 4):
+        j = i * m // 4
+        j = 1 if j < 1 else n - 1 if j > n - 1 else j
+        positions.append((j, i * m - j * 4))
+
+    kth = sorted({idx for j, _ in positions for idx in (j - 1, j)})
+    partitioned = np.partition(arr, kth)
+    q1, median, q3 = (
+        float((partitioned[j - 1] * (4 - delta) + partitioned[j] * delta) / 4) for j, delta in positions
+    )
+    return q1, median, q3
+
+
+def calculate_descriptive_stats(scores_arr: ScoreArray, full_mark: float) -> Dict[str, Any]:
     """
     计算一组分数的所有描述性统计量，包括均值、方差、箱线图数据、频率分布等。
     （已重构以提升稳定性和计算精度）
+
+    相同的分数序列与满分组合（例如只有一个班级时班级与年级的统计）直接命中缓存；
+    调用方会在结果上追加字段，因此每次返回的都是缓存结果的副本。
+    """
+    values = np.ascontiguousarray(scores_arr, dtype=np.float64)
+    cached = _descriptive_stats_cached(values.tobytes(), float(full_mark))
+    stats = dict(cached)
+    stats["boxPlotData"] = dict(cached["boxPlotData"])
+    stats["frequencyDistribution"] = dict(cached["frequencyDistribution"])
+    return stats
+
+
+@lru_cache(maxsize=1024)
+def _descriptive_stats_cached(scores_bytes: bytes, full_mark: float) -> Dict[str, Any]:
     """
-    count = len(scores_arr)
+    calculate_descriptive_stats 的缓存层，以分数数组的原始字节与满分作为键。
+    """
+    return _compute_descriptive_stats(np.frombuffer(scores_bytes, dtype=np.float64), full_mark)
+
+
+def _compute_descriptive_stats(values: np.ndarray, full_mark: float) -> Dict[str, Any]:
+    """
+    描述性统计量的实际计算逻辑，输入为一维 float64 数组。
+    """
+    count = int(values.size)
     # 基础校验：如果没有任何分数，返回一个空的、结构一致的统计字典
     if count == 0:
         return {
@@ -124,18 +214,24 @@ def calculate_descriptive_stats(scores_arr: List[float], full_mark: float) -> Di
             "frequencyDistribution": {}
         }
 
-    # --- 核心统计量计算 ---
-    mean = statistics.mean(scores_arr)
-    std_dev = statistics.pstdev(scores_arr) if count > 1 else 0.0
-    variance = statistics.pvariance(scores_arr) if count > 1 else 0.0
-    min_val, max_val = min(scores_arr), max(scores_arr)
-    skew_kurt = calculate_skewness_kurtosis(scores_arr)
+    # --- 核心统计量计算：一次转换为数组，共享同一组离差完成各阶矩计算 ---
+    mean = float(values.mean())
+    min_val, max_val = float(values.min()), float(values.max())
+    deviations = values - mean
+    sq_deviations = deviations * deviations
+    # 分数全部相同时方差恒为 0，不受均值浮点舍入误差影响
+    variance = float(sq_deviations.mean()) if min_val != max_val else 0.0
+    std_dev = math.sqrt(variance)
+    skew_kurt = _skewness_kurtosis_from_moments(
+        count, variance,
+        float((sq_deviations * deviations).mean()),
+        float((sq_deviations * sq_deviations).mean())
+    )
 
     if count > 1:
-        quantiles = statistics.quantiles(scores_arr, n=4)
-        q1, median, q3 = quantiles[0], quantiles[1], quantiles[2]
+        q1, median, q3 = calculate_quartiles(values)
     else:
-        q1 = median = q3 = scores_arr[0]
+        q1 = median = q3 = min_val
 
     # --- 比率性指标计算（增强稳定性与准确性） ---
     pass_count = 0
@@ -149,11 +245,10 @@ def calculate_descriptive_stats(scores_arr: List[float], full_mark: float) -> Di
         GOOD_THRESHOLD_LOWER = 0.70
         EXCELLENT_THRESHOLD = 0.85
 
-        pass_count = sum(1 for s in scores_arr if s >= full_mark * PASS_THRESHOLD)
-        excellent_count = sum(1 for s in scores_arr if s >= full_mark * EXCELLENT_THRESHOLD)
-        good_count = sum(
-            1 for s in scores_arr if full_mark * GOOD_THRESHOLD_LOWER <= s < full_mark * EXCELLENT_THRESHOLD
-        )
+        pass_count = int(np.count_nonzero(values >= full_mark * PASS_THRESHOLD))
+        excellent_mask = values >= full_mark * EXCELLENT_THRESHOLD
+        excellent_count = int(np.count_nonzero(excellent_mask))
+        good_count = int(np.count_nonzero((values >= full_mark * GOOD_THRESHOLD_LOWER) & ~excellent_mask))
         difficulty = round(mean / full_mark, 3)
 
     # 准确性提升：直接通过人数计算比率，避免浮点数减法误差
@@ -184,89 +279,140 @@ def calculate_descriptive_stats(scores_arr: List[float], full_mark: float) -> Di
         "difficulty": difficulty,
         "skewness": skew_kurt['skewness'],
         "kurtosis": skew_kurt['kurtosis'],
-        "fullMarkCount": sum(1 for s in scores_arr if s == full_mark),
-        "zeroMarkCount": sum(1 for s in scores_arr if s == 0),
+        "fullMarkCount": int(np.count_nonzero(values == full_mark)),
+        "zeroMarkCount": int(np.count_nonzero(values == 0)),
         "boxPlotData": {
             "min": float(min_val), "q1": round(q1, 2), "median": round(median, 2),
             "q3": round(q3, 2), "max": float(max_val)
         },
-        "frequencyDistribution": calculate_frequency_distribution(scores_arr, full_mark)
+        "frequencyDistribution": calculate_frequency_distribution(values, full_mark)
     }
     return stats
 
 
-def calculate_discrimination_index(scores_arr: List[float], full_mark: float) -> float:
+def calculate_standard_scores(raw_scores: np.ndarray, means: np.ndarray, std_devs: np.ndarray,
+                              full_marks: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    计算区分度指数，用于衡量题目或考试对学生成绩高低的区分能力。
+    向量化计算 Z 分、T 分与得分率，可对单个学生（一维）或整班（学生 × 学科 二维）一次性计算。
+
+    标准差为 0 的学科 Z 分记为 0、T 分记为 50；满分为 0 的学科得分率记为 0。
+
+    :param raw_scores: 原始分数，最后一维为学科
+    :param means: 各学科均值
+    :param std_devs: 各学科标准差
+    :param full_marks: 各学科满分
+    :return: (z_scores, t_scores, score_rates)，形状与 raw_scores 相同
     """
-    n = len(scores_arr)
-    if n < 10:
-        return 0.0
-    sorted_scores = sorted(scores_arr)
-    top_n = max(1, int(n * 0.27))
-    high_scores, low_scores = sorted_scores[n - top_n:], sorted_scores[:top_n]
-    if not high_scores or not low_scores:
-        return 0.0
-    high_avg, low_avg = statistics.mean(high_scores), statistics.mean(low_scores)
-    return round((high_avg - low_avg) / full_mark, 3) if full_mark != 0 else 0.0
+    has_spread = std_devs != 0
+    z_scores = np.where(has_spread, (raw_scores - means) / np.where(has_spread, std_devs, 1.0), 0.0)
+    t_scores = np.where(has_spread, 50.0 + 10 * z_scores, 50.0)
+    has_full_mark = full_marks != 0
+    score_rates = np.where(has_full_mark, raw_scores / np.where(has_full_mark, full_marks, 1.0), 0.0)
+    return z_scores, t_scores, score_rates
 
 
-def calculate_advanced_student_metrics(student_report: Dict, class_scores: Dict[str, List[float]]) -> None:
+def calculate_contribution_scores(class_scores: Dict[str, ScoreArray]) -> Dict[str, Optional[np.ndarray]]:
     """
-    计算学生个体的高级指标：学科贡献度、专业化指数。
-    结果直接写入 student_report["metrics"]
+    向量化计算整班学生的学科贡献度：个人得分减去班内其余同学的平均分。
+
+    其余同学平均分 = (班级总分 - 个人得分) / (人数 - 1)，
+    每科只求和一次，即可一次性得到全班的贡献度向量。
+
+    :param class_scores: 字典结构，键为学科名，值为按班级学生顺序排列的分数序列
+    :return: {学科: 与输入顺序一致的贡献度数组}；人数不足 2 人的学科值为 None
     """
-    student_name = student_report["studentName"]
-    metrics = student_report["metrics"]
-    contribution = {}
+    contributions = {}
     for subject, scores in class_scores.items():
-        student_score = student_report["scores"]["rawScores"].get(subject)
-        if student_score is None or len(scores) < 2:
-            contribution[subject] = 0
+        arr = np.asarray(scores, dtype=np.float64)
+        class_count = arr.size
+        if class_count < 2:
+            contributions[subject] = None
             continue
-        class_total = sum(scores)
-        class_count = len(scores)
-        others_mean = (class_total - student_score) / (class_count - 1)
-        contribution[subject] = round(student_score - others_mean, 2)
-    metrics["contributionScore"] = contribution
-
-    # 使用 T 分数计算专业化指数（基尼系数）
-    t_scores_list = list(student_report["scores"]["tScores"].values())
-    if len(t_scores_list) > 1:
-        metrics["specializationIndex"] = round(calculate_gini(t_scores_list), 3)
-    else:
-        metrics["specializationIndex"] = 0.0
+        others_mean = (arr.sum() - arr) / (class_count - 1)
+        contributions[subject] = arr - others_mean
+    return contributions
 
 
-def calculate_advanced_group_metrics(group_scores: List[float], group_stats: Dict) -> None:
+def calculate_advanced_student_metrics(student_report: Dict, contributions: Dict[str, Optional[float]]) -> None:
     """
-    计算群体结构性指标：高分层厚度、后进生支撑力、学术核心密度。
-    结果原地更新 group_stats
+    计算学生个体的高级指标：学科贡献度。
+    结果直接写入 student_report["metrics"]
+
+    专业化指数需要全班 T 分，由 calculate_specialization_indices 对整班批量计算。
+
+    :param contributions: 该生各科贡献度（由 calculate_contribution_scores 对整班批量算出），
+                          值为 None 表示该科无法计算
     """
-    n = len(group_scores)
-    if n < 10:
-        group_stats.update({
-            "highAchieverPenetration": 0,
-            "strugglerSupportIndex": 0,
-            "academicCoreDensity": 0
-        })
-        return
+    metrics = student_report["metrics"]
+    raw_scores = student_report["scores"]["rawScores"]
+    metrics["contributionScore"] = {
+        subject: (0 if value is None or raw_scores.get(subject) is None else round(float(value), 2))
+        for subject, value in contributions.items()
+    }
+
 
-    sorted_scores = sorted(group_scores)
-    top_n = max(1, int(n * 0.27))
-    bottom_n = max(1, int(n * 0.27))
-    mean, std_dev = group_stats.get('mean', 0), group_stats.get('stdDev', 0)
 
-    group_stats["highAchieverPenetration"] = round(statistics.mean(sorted_scores[n - top_n:]), 2)
-    group_stats["strugglerSupportIndex"] = round(statistics.mean(sorted_scores[:bottom_n]), 2)
+def calculate_specialization_indices(student_reports: List[Dict]) -> None:
+    """
+    批量计算一个班级所有学生的专业化指数（各科 T 分的基尼系数）。
+    结果直接写入每个 student_report["metrics"]["specializationIndex"]
+    """
+    t_score_rows = [list(report["scores"]["tScores"].values()) for report in student_reports]
+    for report, t_scores, gini in zip(student_reports, t_score_rows, calculate_gini_rows(t_score_rows)):
+        report["metrics"]["specializationIndex"] = round(gini, 3) if len(t_scores) > 1 else 0.0
+
+
+def _set_group_structure_metrics(group_stats: Dict, scores: np.ndarray, struggler_mean: float,
+                                 high_achiever_mean: float, is_sorted: bool) -> None:
+    """
+    由首尾 27% 均值与整体分布写入群体结构性指标（至少 10 个分数时调用）。
+    """
+    n = scores.size
+    mean, std_dev = group_stats.get('mean', 0), group_stats.get('stdDev', 0)
+    group_stats["highAchieverPenetration"] = round(high_achiever_mean, 2)
+    group_stats["strugglerSupportIndex"] = round(struggler_mean, 2)
 
     if std_dev and std_dev > 0:
-        core_students = [s for s in sorted_scores if (mean - 0.5 * std_dev) <= s <= (mean + 0.5 * std_dev)]
-        group_stats["academicCoreDensity"] = round(len(core_students) / n, 3)
+        lower, upper = mean - 0.5 * std_dev, mean + 0.5 * std_dev
+        if is_sorted:
+            # 分数已升序排列：两次二分查找即可得到落在 [mean-0.5σ, mean+0.5σ] 内的人数
+            core_count = int(np.searchsorted(scores, upper, side='right') - np.searchsorted(scores, lower, side='left'))
+        else:
+            core_count = int(np.count_nonzero((scores >= lower) & (scores <= upper)))
+        group_stats["academicCoreDensity"] = round(core_count / n, 3)
     else:
         group_stats["academicCoreDensity"] = 1.0
 
 
+def calculate_score_stats(scores_arr: ScoreArray, full_mark: float,
+                          sorted_scores: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """
+    一次完成一组分数的描述性统计、区分度指数与群体结构性指标（高分层厚度、后进生支撑力、学术核心密度），
+    首尾 27% 均值只计算一次，由区分度与群体结构指标共用。
+
+    :param scores_arr: 原始顺序的分数序列
+    :param full_mark: 满分值
+    :param sorted_scores: （可选）同一组分数的升序数组；提供时首尾均值与核心密度直接基于它计算
+    :return: 统计结果字典
+    """
+    stats = calculate_descriptive_stats(scores_arr, full_mark)
+    is_sorted = sorted_scores is not None
+    scores = np.asarray(sorted_scores if is_sorted else scores_arr, dtype=np.float64)
+    if scores.size < 10:
+        stats["discriminationIndex"] = 0.0
+        stats.update({
+            "highAchieverPenetration": 0,
+            "strugglerSupportIndex": 0,
+            "academicCoreDensity": 0
+        })
+        return stats
+
+    low_avg, high_avg = _tail_means(scores, max(1, int(scores.size * 0.27)), is_sorted)
+    stats["discriminationIndex"] = round((high_avg - low_avg) / full_mark, 3) if full_mark != 0 else 0.0
+    _set_group_structure_metrics(stats, scores, low_avg, high_avg, is_sorted)
+    return stats
+
+
 def calculate_class_vs_group_metrics(table_stats: Dict, group_stats: Dict) -> None:
     """
     计算班级 vs 年级的对比性指标：内部一致性、四分位竞争力。
@@ -281,22 +427,24 @@ def calculate_class_vs_group_metrics(table_stats: Dict, group_stats: Dict) -> No
             continue
         ts_subj["homogeneityIndex"] = round(ts_subj.get("stdDev", 0) / gs_subj["stdDev"], 3)
 
-        group_scores = gs_subj.get("_scores_cache")
-        if not group_scores:
-            continue
-        group_len = len(group_scores)
+        # 优先使用年级层预先排好序的缓存，避免每个班级重复排序
+        sorted_group = gs_subj.get("_sorted_cache")
+        if sorted_group is None:
+            group_scores = gs_subj.get("_scores_cache")
+            if group_scores is None:
+                continue
+            sorted_group = np.sort(np.asarray(group_scores, dtype=np.float64))
+        group_len = len(sorted_group)
         if group_len == 0:
             continue
 
-        quartiles_competitiveness = {}
-        for q_name in ["q1", "median", "q3"]:
-            class_q_score = ts_subj.get(q_name, 0)
-            percentile_rank = round(
-                sum(1 for s in group_scores if s < class_q_score) / group_len * 100, 2
-            )
-            quartiles_competitiveness[q_name] = percentile_rank
+        # 用二分查找统计“低于该分数的人数”，替代逐个比较
+        q_names = ["q1", "median", "q3"]
+        below_counts = np.searchsorted(sorted_group, [ts_subj.get(q, 0) for q in q_names], side='left')
 
-        ts_subj["quartileCompetitiveness"] = quartiles_competitiveness
+        ts_subj["quartileCompetitiveness"] = {
+            q_name: round(int(below) / group_len * 100, 2) for q_name, below in zip(q_names, below_counts)
+        }
 
 
 def analyze_historical_trends(student_report: Dict, student_history: Dict) -> None:
@@ -305,7 +453,11 @@ def analyze_historical_trends(student_report: Dict, student_history: Dict) -> No
     包括总分趋势、名次变化、波动度等。
     """
     history_metrics = {"trend": {}, "stability": {}}
+    # 上次考试成绩取自时间顺序上的最后一场考试（仅在此处按需读取，无需预先为所有学生整理）
     last_exam = student_history.get("lastExam")
+    all_exams = student_history.get("allExams", [])
+    if all_exams and all_exams[-1].get("studentScores"):
+        last_exam = all_exams[-1]["studentScores"][0]
 
     # 趋势分析：与上次考试对比
     if last_exam:
@@ -319,20 +471,20 @@ def analyze_historical_trends(student_report: Dict, student_history: Dict) -> No
                 history_metrics["trend"][rank_type] = last_rank - current_rank
 
     # 稳定性分析：多次考试的波动性
-    all_exams = student_history.get("allExams", [])
     if len(all_exams) >= 2:
         percentile_ranks = [exam['gradePercentileRank'] for exam in all_exams if 'gradePercentileRank' in exam]
         if len(percentile_ranks) >= 2:
-            history_metrics["stability"]["gradePercentileRankVolatility"] = round(statistics.pstdev(percentile_ranks),
-                                                                                  2)
+            history_metrics["stability"]["gradePercentileRankVolatility"] = round(
+                float(np.std(np.asarray(percentile_ranks, dtype=np.float64))), 2)
         total_t_scores = [exam['totalTScore'] for exam in all_exams if 'totalTScore' in exam]
         if len(total_t_scores) >= 2:
-            history_metrics["stability"]["totalTScoreVolatility"] = round(statistics.pstdev(total_t_scores), 2)
+            history_metrics["stability"]["totalTScoreVolatility"] = round(
+                float(np.std(np.asarray(total_t_scores, dtype=np.float64))), 2)
 
     student_report["metrics"]["history"] = history_metrics
 
 
-def analyze_trend_slope(historical_values: List[float]) -> float:
+def analyze_trend_slope(historical_values: List[Optional[float]]) -> float:
     """
     使用最小二乘法拟合线性趋势，计算分数序列的趋势斜率。
     趋势上升为正，下降为负，平稳为零。
@@ -342,9 +494,16 @@ def analyze_trend_slope(historical_values: List[float]) -> float:
     if n < 2:
         return 0.0
 
-    sum_x = sum(p[0] for p in valid_points)
     sum_y = sum(p[1] for p in valid_points)
     sum_xy = sum(p[0] * p[1] for p in valid_points)
+
+    if n == len(historical_values):
+        # 序列无缺失时 x 即为 1..n，sum_x 与 sum_xx 有解析解，
+        # 分母 n*sum_xx - sum_x^2 化简为 n^2(n^2-1)/12
+        slope = (12 * sum_xy - 6 * (n + 1) * sum_y) / (n * (n * n - 1))
+        return round(slope, 3)
+
+    sum_x = sum(p[0] for p in valid_points)
     sum_xx = sum(p[0] * p[0] for p in valid_points)
 
     denominator = n * sum_xx - sum_x * sum_x
@@ -353,4 +512,4 @@ def analyze_trend_slope(historical_values: List[float]) -> float:
 
     numerator = n * sum_xy - sum_x * sum_y
     slope = numerator / denominator
-    return round(slope, 3)
\ No newline at end of file
+    return round(slope, 3)
@@ -1,65 +1,51 @@
 # app/analysis_engine/data_loader.py
 
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Iterable, Tuple, Optional
 from sqlalchemy import and_
-from sqlalchemy.orm import Session, joinedload, subqueryload
+from sqlalchemy.orm import Session, subqueryload
 from app import models
 
+# 流式读取查询结果时每批拉取的行数，避免一次性物化整个年级的成绩行
+STREAM_BATCH_SIZE = 2000
 
-def _format_historical_data(scores: List[models.Score]) -> Dict[str, Any]:
+
+def _format_historical_data(rows: Iterable[Tuple[Any, ...]]) -> Dict[str, Any]:
     """
-    辅助函数：将历史成绩 Score 对象列表格式化为嵌套字典结构，
+    辅助函数：将历史成绩行格式化为嵌套字典结构，
     便于后续分析模块按考试时间顺序使用历史数据。
+
+    结果行需已按考试日期升序排列，此时各学生的考试列表按首次出现的顺序追加即为时间顺序，
+    单次遍历即可直接生成最终结构，无需中间字典与逐生排序。
+
+    :param rows: 列查询结果（可为流式迭代器），每行为 (score, student_name, class_name, exam_name, exam_date, subject_name)。
     """
     history_map = {}
-    if not scores:
-        return {}
-
-    for score in scores:
-        # 跳过缺失关键关联对象的成绩记录
-        if not (score.student and score.student.class_ and score.exam and score.subject):
-            continue
-
-        exam_name = score.exam.name
-        exam_date = score.exam.exam_date.isoformat() if score.exam.exam_date else ''
-        student_name = score.student.name
-        subject_name = score.subject.name
-        class_name = score.student.class_.name
-
-        # 构建每位学生、每场考试的嵌套结构
-        student_entry = history_map.setdefault(student_name, {})
-        exam_entry = student_entry.setdefault(exam_name, {
-            "examName": exam_name,
-            "examDate": exam_date,
-            "scores": {},
-            "className": class_name
-        })
-        exam_entry["scores"][subject_name] = score.score
-
-    # 将学生的所有考试按时间排序后打包成最终结构
-    final_historical_data = {}
-    for student_name, exams in history_map.items():
-        all_exams_list = []
-        for exam_name, exam_data in exams.items():
-            student_scores_entry = {
+    # 每位学生各场考试对应的成绩条目 {(学生, 考试): student_scores_entry}
+    exam_entries = {}
+    for score_value, student_name, class_name, exam_name, exam_date, subject_name in rows:
+        student_scores_entry = exam_entries.get((student_name, exam_name))
+        if student_scores_entry is None:
+            student_scores_entry = exam_entries[(student_name, exam_name)] = {
                 "studentName": student_name,
-                "tableName": exam_data["className"],
-                "totalScore": sum(exam_data["scores"].values()),
-                "scores": exam_data["scores"]
+                "tableName": class_name,
+                "totalScore": 0,
+                "scores": {}
             }
-            exam_wrapper = {
+            student_history = history_map.get(student_name)
+            if student_history is None:
+                student_history = history_map[student_name] = {"allExams": []}
+            student_history["allExams"].append({
                 "examName": exam_name,
-                "examDate": exam_data['examDate'],
+                "examDate": exam_date.isoformat() if exam_date else '',
                 "studentScores": [student_scores_entry]
-            }
-            all_exams_list.append(exam_wrapper)
+            })
+        student_scores_entry["scores"][subject_name] = score_value
 
-        if all_exams_list:
-            final_historical_data[student_name] = {
-                "allExams": sorted(all_exams_list, key=lambda x: x['examDate'])
-            }
+    # 各场考试总分在所有科目写入后统一求和
+    for student_scores_entry in exam_entries.values():
+        student_scores_entry["totalScore"] = sum(student_scores_entry["scores"].values())
 
-    return final_historical_data
+    return history_map
 
 
 def load_data_for_single_exam(exam_id: int, db: Session, scope_level: str, scope_ids: List[int]) -> Tuple[
@@ -91,81 +77,81 @@ def load_data_for_single_exam(exam_id: int, db: Session, scope_level: str, scope
     if not full_marks:
         raise ValueError(f"考试 '{exam.name}' 未定义任何科目或满分。")
 
-    # 构建本场考试下指定范围内的成绩查询
-    scores_query = db.query(models.Score).options(
-        joinedload(models.Score.student).joinedload(models.Student.class_),
-        joinedload(models.Score.subject),
-        joinedload(models.Score.exam)
-    ).filter(models.Score.exam_id == exam_id)
+    # 构建本场考试下指定范围内的成绩查询：直接选取所需列，返回普通元组，跳过 ORM 对象实例化
+    scores_query = db.query(
+        models.Score.score,
+        models.Score.student_id,
+        models.Student.name.label('student_name'),
+        models.Class.name.label('class_name'),
+        models.Subject.name.label('subject_name')
+    ).join(models.Score.student).join(models.Student.class_).join(models.Score.subject).filter(
+        models.Score.exam_id == exam_id)
 
     if scope_level == 'GRADE':
         # 筛选指定年级内的学生
-        scores_query = scores_query.join(models.Score.student).join(models.Student.class_).filter(
-            models.Class.grade_id.in_(scope_ids))
+        scores_query = scores_query.filter(models.Class.grade_id.in_(scope_ids))
     elif scope_level == 'CLASS':
         # 筛选指定班级内的学生
-        scores_query = scores_query.join(models.Score.student).filter(
-            models.Student.class_id.in_(scope_ids))
-
-    all_scoped_scores = scores_query.all()
-
-    # 若无有效成绩数据，则返回空结构
-    if not all_scoped_scores:
-        return {"groupName": exam.name, "fullMarks": full_marks, "tables": []}, None
+        scores_query = scores_query.filter(models.Student.class_id.in_(scope_ids))
 
+    # 构建 (班级, 学生) × 科目 的成绩网格：分批流式读取结果行，单次遍历完成透视，缺失科目默认为 0.0
+    score_template = dict.fromkeys(full_marks, 0.0)
+    students_by_class: Dict[str, Dict[str, Dict[str, Any]]] = {}
     # 学生 ID 集合，用于后续历史成绩查询
-    student_ids_in_scope = {score.student_id for score in all_scoped_scores if score.student_id}
-
-    # 构建嵌套表结构（按班级、学生、科目分组）
-    tables_dict: Dict[str, Dict[str, Any]] = {}
-    for score in all_scoped_scores:
-        if not (score.student and score.student.class_ and score.subject):
-            continue
-        class_name, student_name = score.student.class_.name, score.student.name
-        subject_name = score.subject.name
-
-        # 初始化班级结构
-        if class_name not in tables_dict:
-            tables_dict[class_name] = {'tableName': class_name, 'students': {}}
-
-        # 初始化学生结构
-        student_scores = tables_dict[class_name]['students'].setdefault(student_name, {
-            'studentName': student_name,
-            'scores': {s: 0.0 for s in full_marks.keys()}
-        })
+    student_ids_in_scope = set()
+    for score_value, student_id, student_name, class_name, subject_name in scores_query.order_by(
+            models.Score.id).yield_per(STREAM_BATCH_SIZE):
+        if student_id:
+            student_ids_in_scope.add(student_id)
+
+        class_students = students_by_class.get(class_name)
+        if class_students is None:
+            class_students = students_by_class[class_name] = {}
+
+        student_entry = class_students.get(student_name)
+        if student_entry is None:
+            student_entry = class_students[student_name] = {
+                'studentName': student_name,
+                'scores': score_template.copy()
+            }
 
         # 写入实际成绩
-        if score.score is not None:
-            student_scores['scores'][subject_name] = score.score
+        if score_value is not None:
+            student_entry['scores'][subject_name] = score_value
+
+    # 若无有效成绩数据，则返回空结构
+    if not students_by_class:
+        return {"groupName": exam.name, "fullMarks": full_marks, "tables": []}, None
 
     # 构建分析引擎所需的数据结构（当前考试）
     analysis_input = {
         "groupName": exam.name,
         "fullMarks": full_marks,
         "tables": [{
-            'tableName': name,
-            'students': list(data['students'].values())
-        } for name, data in tables_dict.items()]
+            'tableName': class_name,
+            'students': list(class_students.values())
+        } for class_name, class_students in students_by_class.items()]
     }
 
-    # 查询该考试前的所有历史成绩（只取参与本次考试的学生）
-    historical_scores_query = db.query(models.Score).join(
-        models.Exam, models.Score.exam_id == models.Exam.id
-    ).options(
-        joinedload(models.Score.student).joinedload(models.Student.class_),
-        joinedload(models.Score.exam),
-        joinedload(models.Score.subject)
+    # 查询该考试前的所有历史成绩（只取参与本次考试的学生），同样按列返回元组
+    historical_scores_query = db.query(
+        models.Score.score,
+        models.Student.name,
+        models.Class.name,
+        models.Exam.name,
+        models.Exam.exam_date,
+        models.Subject.name
+    ).join(models.Score.student).join(models.Student.class_).join(models.Score.exam).join(
+        models.Score.subject
     ).filter(
         and_(
             models.Score.student_id.in_(student_ids_in_scope),
             models.Score.exam_id != exam_id,
             models.Exam.exam_date < exam.exam_date
         )
-    )
-
-    historical_scores = historical_scores_query.all()
+    ).order_by(models.Exam.exam_date, models.Score.id)
 
-    # 格式化为历史考试结构（以学生为单位）
-    student_history_map = _format_historical_data(historical_scores)
+    # 格式化为历史考试结构（以学生为单位），结果行按批流式消费
+    student_history_map = _format_historical_data(historical_scores_query.yield_per(STREAM_BATCH_SIZE))
 
     return analysis_input, student_history_map
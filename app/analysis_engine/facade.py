@@ -21,6 +21,9 @@ class AnalysisEngine:
         self._analysis_results = analysis_results
         # 图表数据缓存，首次访问时生成
         self._chart_data: Optional[Dict[str, Any]] = None
+        # 班级名 / 学生姓名到分析结果的索引，首次查询时建立
+        self._class_index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._student_index: Optional[Dict[str, Dict[str, Any]]] = None
 
     def get_full_report(self) -> Dict[str, Any]:
         """
@@ -52,21 +55,25 @@ class AnalysisEngine:
         根据班级名称获取该班的详细分析结果。
         若找不到对应班级，返回 None。
         """
-        for table in self._analysis_results.get("tables", []):
-            if table.get("tableName") == class_name:
-                return table
-        return None
+        if self._class_index is None:
+            # 同名班级以第一个出现的为准，与顺序查找的结果一致
+            self._class_index = {}
+            for table in self._analysis_results.get("tables", []):
+                self._class_index.setdefault(table.get("tableName"), table)
+        return self._class_index.get(class_name)
 
     def get_student_report(self, student_name: str) -> Optional[Dict[str, Any]]:
         """
         根据学生姓名获取该学生的分析结果。
         若找不到该学生，返回 None。
         """
-        for table in self._analysis_results.get("tables", []):
-            for student in table.get("students", []):
-                if student.get("studentName") == student_name:
-                    return student
-        return None
+        if self._student_index is None:
+            # 同名学生以第一个出现的为准，与顺序查找的结果一致
+            self._student_index = {}
+            for table in self._analysis_results.get("tables", []):
+                for student in table.get("students", []):
+                    self._student_index.setdefault(student.get("studentName"), student)
+        return self._student_index.get(student_name)
 
 
 # ------------------------------------------------------------------------------
@@ -1,9 +1,268 @@
-import statistics
-from typing import Dict, Optional, Any
+from operator import itemgetter
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
 
 from . import core
 
 
+def _build_table_stats(class_score_matrix: np.ndarray, total_scores_table: np.ndarray, subjects: List[str],
+                       full_marks: Dict[str, float], total_full_marks: float,
+                       group_stats: Dict) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    计算单个班级的各科及总分统计指标（含班级 vs 年级对比指标）。
+
+    :param class_score_matrix: 班级 (学生 × 学科) 分数矩阵，取自年级分数矩阵的对应行
+    :param total_scores_table: 班级学生总分数组，顺序与分数矩阵一致
+    :return: (table_stats, class_scores_by_subject)，后者供学生个体指标复用
+    """
+    table_stats = {}
+    class_scores_by_subject = {}
+
+    # 班级各科统计指标（班级层无需完整排序：首尾 27% 由 np.partition 选出）
+    for subject_index, subject in enumerate(subjects):
+        score_values = class_score_matrix[:, subject_index]
+        class_scores_by_subject[subject] = score_values
+        table_stats[subject] = core.calculate_score_stats(score_values, full_marks[subject])
+
+    # 班级总分统计指标
+    table_stats['totalScore'] = core.calculate_score_stats(total_scores_table, total_full_marks)
+
+    # 班级 VS 年级横向指标
+    core.calculate_class_vs_group_metrics(table_stats, group_stats)
+
+    return table_stats, class_scores_by_subject
+
+
+def _group_by_table(students: List[Dict]) -> Dict[str, List[int]]:
+    """
+    按班级名将学生在列表中的下标分组，组内保持输入列表中的相对顺序。
+    """
+    rows_by_table = {}
+    for row, student in enumerate(students):
+        rows_by_table.setdefault(student['tableName'], []).append(row)
+    return rows_by_table
+
+
+# 学生画像标签：下标 0 为默认类型，其余由 _PROFILE_TABLE 按 (总分 T 分档, 偏科指数档) 查得
+_STUDENT_PROFILES = ("潜力提升型", "拔尖偏科型", "拔尖均衡型", "稳健发展型", "中坚力量型", "短板制约型", "基础薄弱型")
+
+# 总分 T 分分档边界：<45、[45, 55)、[55, 62)、>=62
+_PROFILE_T_EDGES = np.array([45, 55, 62], dtype=np.float64)
+# 偏科指数分档边界：<8、[8, 12)、>=12
+_PROFILE_IMBALANCE_EDGES = np.array([8, 12], dtype=np.float64)
+# 画像查找表：行为 T 分档，列为偏科指数档，值为 _STUDENT_PROFILES 下标；
+# 末行 / 末列对应指标为 NaN 的情况（所有比较均不成立）
+_PROFILE_TABLE = np.array([
+    [6, 6, 5, 0],  # T < 45：基础薄弱型 / 短板制约型
+    [4, 4, 4, 4],  # 45 <= T < 55：中坚力量型（与偏科指数无关）
+    [3, 0, 0, 0],  # 55 <= T < 62：偏科指数 < 8 为稳健发展型，否则为默认类型
+    [2, 2, 1, 0],  # T >= 62：拔尖均衡型 / 拔尖偏科型
+    [0, 0, 0, 0],  # T 为 NaN：默认类型
+], dtype=np.int8)
+
+
+def _classify_profiles(total_t_scores: np.ndarray, imbalance_indices: np.ndarray) -> List[str]:
+    """
+    按总分 T 分与偏科指数（T 分波动）批量识别学生画像标签。
+
+    两次 searchsorted 把全班学生分别量化到 T 分档与偏科指数档，再查 _PROFILE_TABLE 得到画像，
+    无需逐条件比较。
+    """
+    t_buckets = np.where(np.isnan(total_t_scores), len(_PROFILE_T_EDGES) + 1,
+                         np.searchsorted(_PROFILE_T_EDGES, total_t_scores, side='right'))
+    imbalance_buckets = np.where(np.isnan(imbalance_indices), len(_PROFILE_IMBALANCE_EDGES) + 1,
+                                 np.searchsorted(_PROFILE_IMBALANCE_EDGES, imbalance_indices, side='right'))
+    profile_codes = _PROFILE_TABLE[t_buckets, imbalance_buckets]
+    return [_STUDENT_PROFILES[code] for code in profile_codes.tolist()]
+
+
+def _history_rank_slopes(student_history_map: Dict[str, Any]) -> Dict[str, float]:
+    """
+    预先计算每位学生历次考试年级百分位排名的趋势斜率。
+
+    每位学生的历史排名序列只提取一次，各班分析时直接按学生名查表，不再逐生重复遍历历史考试。
+    仅包含两场及以上历史考试的学生。
+
+    :param student_history_map: 学生历史成绩数据 {学生名: {"allExams": [...]}}
+    :return: {学生名: 年级百分位排名斜率}
+    """
+    rank_slopes = {}
+    for student_name, student_history in student_history_map.items():
+        all_exams = student_history.get("allExams", [])
+        if len(all_exams) >= 2:
+            rank_slopes[student_name] = core.analyze_trend_slope(
+                [exam.get('studentScores', [{}])[0].get('gradePercentileRank') for exam in all_exams])
+    return rank_slopes
+
+
+def _analyze_table(table_entry: Tuple[Dict, List[Dict], np.ndarray, np.ndarray], subjects: List[str], full_marks: Dict[str, float],
+                   total_full_marks: float, group_stats: Dict, student_ranks: Dict,
+                   student_history_map: Optional[Dict[str, Any]], history_rank_slopes: Dict[str, float],
+                   subject_vectors: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> Dict:
+    """
+    完成单个班级的全部分析：班级统计指标、学生个体指标、画像与历史趋势。
+
+    各班之间互不依赖，只读取年级统计、排名与历史数据；班级数据以矩阵切片传入，
+    班级统计与学生指标直接复用年级层已算好的结果，无需再逐生整理成绩。
+
+    :param table_entry: (班级原始数据, 按最终排序排列的班级学生列表, 班级分数矩阵, 班级总分数组)
+    :param history_rank_slopes: 预先计算的学生历史年级百分位排名斜率 {学生名: 斜率}
+    :param subject_vectors: 各学科 (年级均值, 年级标准差, 满分) 向量，与 subjects 顺序一致
+    :return: 班级分析结果 {tableName, tableStats, students}
+    """
+    table_data, class_students_data, class_score_matrix, class_total_scores = table_entry
+    subject_means, subject_std_devs, subject_full_marks = subject_vectors
+    table_stats, class_scores_by_subject = _build_table_stats(
+        class_score_matrix, class_total_scores, subjects, full_marks, total_full_marks, group_stats)
+
+    # -----------------------
+    # 学生画像与个体指标
+    # -----------------------
+    students_results_list = []
+    # 班级 T 分 Gini 系数的输入：科目与考试一致的学生直接取 T 分矩阵对应行，其余学生的 T 分单独收集
+    regular_rows = np.zeros(len(class_students_data), dtype=bool)
+    irregular_t_scores = []
+    # 全班各科贡献度一次性向量化计算，循环内按学生下标取值
+    class_contributions = core.calculate_contribution_scores(class_scores_by_subject)
+
+    # 全班 Z 分 / T 分 / 得分率以 (学生 × 学科) 矩阵一次性计算，T 分波动度按行求标准差
+    class_z_block, class_t_block, class_rate_block = core.calculate_standard_scores(
+        class_score_matrix, subject_means, subject_std_devs, subject_full_marks)
+    class_imbalance = class_t_block.std(axis=1).tolist() if subjects else [0.0] * len(class_students_data)
+    # 强弱科下标：T 分最高取首个、最低取末个（与按 T 分稳定降序排序后取首尾一致）
+    if subjects:
+        class_strongest = class_t_block.argmax(axis=1).tolist()
+        class_weakest = (len(subjects) - 1 - class_t_block[:, ::-1].argmin(axis=1)).tolist()
+
+    # 全班总分 T 分向量
+    total_score_mean = group_stats['totalScore'].get('mean', 0)
+    total_score_std_dev = group_stats['totalScore'].get('stdDev', 0)
+    if total_score_std_dev != 0:
+        class_total_t_score_array = 50.0 + 10 * ((class_total_scores - total_score_mean) / total_score_std_dev)
+    else:
+        class_total_t_score_array = np.full(len(class_students_data), 50.0)
+    class_total_t_scores = class_total_t_score_array.tolist()
+
+    # 及格线 / 优秀线与各科贡献度列表在循环外准备好，循环内只做局部变量访问
+    PASS_THRESHOLD, EXCELLENT_THRESHOLD = 0.60, 0.85
+    pass_score_line = total_full_marks * PASS_THRESHOLD
+    excellent_score_line = total_full_marks * EXCELLENT_THRESHOLD
+    contribution_lists = {
+        subject: (values.tolist() if values is not None else None)
+        for subject, values in class_contributions.items()
+    }
+
+    for student_index, student_data in enumerate(class_students_data):
+        student_name = student_data['studentName']
+        student_subjects = list(student_data['scores'])
+        student_rank = student_ranks[student_name]
+
+        if student_subjects == subjects:
+            z_row = class_z_block[student_index].tolist()
+            t_row = class_t_block[student_index].tolist()
+            rate_row = class_rate_block[student_index].tolist()
+            imbalance_value = class_imbalance[student_index]
+            if t_row:
+                strongest, weakest = class_strongest[student_index], class_weakest[student_index]
+            regular_rows[student_index] = True
+        else:
+            # 科目缺失或含额外科目时，按该生实际科目单独计算（未知科目的均值/标准差视为 0、满分视为 100）
+            subject_stats = [group_stats.get(subject, {}) for subject in student_subjects]
+            z_values, t_values, rate_values = core.calculate_standard_scores(
+                np.asarray(list(student_data['scores'].values()), dtype=np.float64),
+                np.asarray([gs.get('mean', 0) for gs in subject_stats], dtype=np.float64),
+                np.asarray([gs.get('stdDev', 0) for gs in subject_stats], dtype=np.float64),
+                np.asarray([full_marks.get(subject, 100) for subject in student_subjects],
+                           dtype=np.float64))
+            z_row, t_row, rate_row = z_values.tolist(), t_values.tolist(), rate_values.tolist()
+            imbalance_value = float(t_values.std()) if t_row else 0.0
+            if t_row:
+                strongest, weakest = int(t_values.argmax()), len(t_row) - 1 - int(t_values[::-1].argmin())
+            irregular_t_scores.extend(t_row)
+
+        z_scores = {subject: round(z, 3) for subject, z in zip(student_subjects, z_row)}
+        t_scores = {subject: round(t, 2) for subject, t in zip(student_subjects, t_row)}
+        score_rates = {subject: round(rate, 3) for subject, rate in zip(student_subjects, rate_row)}
+
+        # 总分 T 分
+        t_scores['totalScore'] = round(class_total_t_scores[student_index], 2)
+
+        # 画像指标：强弱科、T分波动、画像类型
+        if t_row:
+            strength_subjects = [{"subject": student_subjects[strongest], "tScore": round(t_row[strongest], 2)}]
+            weakness_subjects = [{"subject": student_subjects[weakest], "tScore": round(t_row[weakest], 2)}]
+        else:
+            strength_subjects, weakness_subjects = [], []
+
+        student_report = {
+            "studentName": student_name,
+            "tableName": student_data['tableName'],
+            "totalScore": round(student_data['totalScore'], 2),
+            "classRank": student_rank['totalScore']['classRank'],
+            "gradeRank": student_rank['totalScore']['gradeRank'],
+            "ranks": student_rank,
+            "scores": {
+                "rawScores": student_data['scores'],
+                "zScores": z_scores,
+                "tScores": t_scores,
+                "scoreRates": score_rates
+            },
+            "metrics": {
+                "imbalanceIndex": round(imbalance_value, 2) if len(t_row) > 1 else 0.0,
+                "strengthSubjects": strength_subjects,
+                "weaknessSubjects": weakness_subjects,
+            }
+        }
+
+        # 补充：距离及格线/优秀线的差值
+        if student_report['totalScore'] < pass_score_line:
+            student_report["metrics"]["pointsToPass"] = round(pass_score_line - student_report['totalScore'], 2)
+        if student_report['totalScore'] < excellent_score_line:
+            student_report["metrics"]["pointsToExcellent"] = round(
+                excellent_score_line - student_report['totalScore'], 2)
+
+        # 学生画像标签在全班循环结束后按总分 T 分与偏科指数批量识别
+        student_report["profile"] = None
+
+        # 个体贡献度（专业化指数在全班循环结束后批量计算）
+        core.calculate_advanced_student_metrics(student_report, {
+            subject: (values[student_index] if values is not None else None)
+            for subject, values in contribution_lists.items()
+        })
+
+        # 历史趋势分析（如提供）
+        if student_history_map and student_name in student_history_map:
+            core.analyze_historical_trends(student_report, student_history_map[student_name])
+            rank_slope = history_rank_slopes.get(student_name)
+            if rank_slope is not None:
+                student_report["metrics"].setdefault("history", {})["gradePercentileRankSlope"] = rank_slope
+
+        students_results_list.append(student_report)
+
+    # 全班学生画像标签识别
+    profiles = _classify_profiles(
+        class_total_t_score_array,
+        np.array([report["metrics"]["imbalanceIndex"] for report in students_results_list], dtype=np.float64))
+    for report, profile in zip(students_results_list, profiles):
+        report["profile"] = profile
+
+    # 全班专业化指数：T 分矩阵按行排序后一次性计算基尼系数
+    core.calculate_specialization_indices(students_results_list)
+
+    # 班级 T 分 Gini 系数
+    table_stats["tScoreGiniCoefficient"] = core.calculate_gini(
+        np.concatenate([class_t_block[regular_rows].ravel(), np.asarray(irregular_t_scores, dtype=np.float64)]))
+
+    # 班级学生按年级最终顺序（逐科排序的结果）遍历，输出前需按班级总分名次原地重排
+    students_results_list.sort(key=itemgetter('classRank'))
+    return {
+        "tableName": table_data['tableName'],
+        "tableStats": table_stats,
+        "students": students_results_list
+    }
+
+
 def perform_analysis(data: Dict, student_history_map: Optional[Dict[str, Any]] = None) -> Dict:
     """
     执行完整分析流程，生成结构化的深度分析报告。
@@ -34,23 +293,27 @@ def perform_analysis(data: Dict, student_history_map: Optional[Dict[str, Any]] =
             "error": "在指定范围内没有有效的学生成绩数据进行分析。"
         }
 
-    # 为每位学生补充所在班级名和总分
-    for student in all_students_flat:
-        student['tableName'] = next((t['tableName'] for t in data['tables'] if student in t['students']), None)
-        student['totalScore'] = sum(student['scores'].get(s, 0) for s in subjects)
+    # 为每位学生补充所在班级名（按班级遍历一次即可确定归属，无需逐个学生回查各班名单）
+    for table in data['tables']:
+        for student in table['students']:
+            student['tableName'] = table['tableName']
 
-    # --- 历史数据预处理（如果存在） ---
-    if student_history_map:
-        for s_name, history in student_history_map.items():
-            # 稳定性增强：确保列表非空再访问索引
-            if history.get("allExams") and len(history["allExams"]) > 0:
-                last_exam_wrapper = history["allExams"][-1]
-                if last_exam_wrapper.get("studentScores"):
-                    history["lastExam"] = last_exam_wrapper["studentScores"][0]
+    # 年级 (学生 × 学科) 分数矩阵一次构建；总分取逐行按学科顺序的累计和末项，与逐科依次相加的结果一致
+    grade_count = len(all_students_flat)
+    input_score_matrix = np.array(
+        [[s['scores'].get(subject, 0) for subject in subjects] for s in all_students_flat], dtype=np.float64
+    ).reshape(grade_count, len(subjects))
+    total_scores = (input_score_matrix.cumsum(axis=1)[:, -1] if subjects
+                    else np.zeros(grade_count, dtype=np.float64))
+    for student, total_score in zip(all_students_flat, total_scores.tolist()):
+        student['totalScore'] = total_score
 
     # --- 排名计算（年级 + 班级） ---
-    all_students_flat.sort(key=lambda x: x['totalScore'], reverse=True)
-    grade_count = len(all_students_flat)
+    # 按总分稳定降序排列（并列者保持原有顺序，与 list.sort(reverse=True) 一致），分数矩阵与总分同步重排
+    total_order = np.argsort(-total_scores, kind='stable')
+    all_students_flat = [all_students_flat[i] for i in total_order.tolist()]
+    rank_matrix = input_score_matrix[total_order]
+    rank_totals = total_scores[total_order]
     student_ranks = {s['studentName']: {"totalScore": {}} for s in all_students_flat}
 
     # 年级排名与百分位计算
@@ -60,68 +323,75 @@ def perform_analysis(data: Dict, student_history_map: Optional[Dict[str, Any]] =
         student_ranks[student['studentName']]['totalScore']['gradePercentileRank'] = round(
             (grade_count - rank + 1) / grade_count * 100, 2) if grade_count > 0 else 0
 
-    # 班级内排名与百分位计算
-    for table_name in {t['tableName'] for t in data['tables']}:
-        class_students = sorted([s for s in all_students_flat if s['tableName'] == table_name],
-                                key=lambda x: x['totalScore'], reverse=True)
-        class_count = len(class_students)
-        for i, student in enumerate(class_students):
+    # 班级内排名与百分位计算：按总分排序后的列表一次分组，各班名单天然有序
+    for class_rows in _group_by_table(all_students_flat).values():
+        class_count = len(class_rows)
+        for i, row in enumerate(class_rows):
+            student = all_students_flat[row]
             rank = i + 1
             student_ranks[student['studentName']]['totalScore']['classRank'] = rank
             student_ranks[student['studentName']]['totalScore']['classPercentileRank'] = round(
                 (class_count - rank + 1) / class_count * 100, 2) if class_count > 0 else 0
 
-    # 学科维度的班级与年级排名
-    student_ranks_subjects = {s['studentName']: {} for s in all_students_flat}
-    for subject in subjects:
-        # 年级学科排名
-        all_students_flat.sort(key=lambda x: x['scores'].get(subject, 0), reverse=True)
-        for i, student in enumerate(all_students_flat):
-            student_ranks_subjects[student['studentName']][subject] = {'gradeRank': i + 1}
-
-        # 班级学科排名
-        for table_name in {t['tableName'] for t in data['tables']}:
-            class_students_subject = sorted(
-                [s for s in all_students_flat if s['tableName'] == table_name],
-                key=lambda x: x['scores'].get(subject, 0), reverse=True)
-            for i, student in enumerate(class_students_subject):
-                student_ranks_subjects[student['studentName']][subject]['classRank'] = i + 1
+    # 学科维度的班级与年级排名：
+    # 在总分排序后的分数矩阵上，各科依次做稳定的降序 argsort。
+    # 每一轮都在上一轮顺序的基础上排序，与逐科对学生列表原地稳定排序的累积效果一致（并列者保持上一轮的相对顺序）
+    table_codes = {}
+    table_index = np.fromiter((table_codes.setdefault(s['tableName'], len(table_codes)) for s in all_students_flat),
+                              dtype=np.int64, count=grade_count)
+    positions = np.arange(grade_count)
+    order = positions
+    # 各科年级 / 班级名次先写入 (学生 × 学科) 整数矩阵（行序同总分排序），最后一次性整合进排名字典
+    grade_subject_ranks = np.empty((grade_count, len(subjects)), dtype=np.int64)
+    class_subject_ranks = np.empty((grade_count, len(subjects)), dtype=np.int64)
+    for subject_index in range(len(subjects)):
+        order = order[np.argsort(-rank_matrix[order, subject_index], kind='stable')]
+        grade_subject_ranks[order, subject_index] = positions + 1
+
+        # 班级学科排名：当前顺序下按班级稳定分组，组内序号即班级名次
+        ordered_tables = table_index[order]
+        by_table = np.argsort(ordered_tables, kind='stable')
+        grouped_tables = ordered_tables[by_table]
+        class_ranks = np.empty(grade_count, dtype=np.int64)
+        class_ranks[by_table] = positions - np.searchsorted(grouped_tables, grouped_tables) + 1
+        class_subject_ranks[order, subject_index] = class_ranks
 
     # 整合进学生总排名结构中
-    for s_name, s_data in student_ranks_subjects.items():
-        student_ranks[s_name]['subjects'] = s_data
+    for student, grade_rank_row, class_rank_row in zip(
+            all_students_flat, grade_subject_ranks.tolist(), class_subject_ranks.tolist()):
+        student_ranks[student['studentName']]['subjects'] = {
+            subject: {'gradeRank': grade_rank, 'classRank': class_rank}
+            for subject, grade_rank, class_rank in zip(subjects, grade_rank_row, class_rank_row)
+        }
+
+    # 学生列表调整为最终排序（与原地逐科排序后的顺序一致）
+    all_students_flat = [all_students_flat[i] for i in order.tolist()]
 
     # -----------------------------
     # 年级层级统计分析
     # -----------------------------
     group_stats = {}
-    for subject in subjects:
-        scores = [s['scores'].get(subject, 0) for s in all_students_flat]
-        group_stats[subject] = core.calculate_descriptive_stats(scores, data['fullMarks'][subject])
-        group_stats[subject]['discriminationIndex'] = core.calculate_discrimination_index(scores,
-                                                                                          data['fullMarks'][subject])
+    # 年级分数矩阵（学生 × 学科）转为列优先存储使每科分数连续；
+    # 各科统计、排序缓存与相关性矩阵均直接复用其列，无需再逐科遍历学生列表
+    score_matrix = np.asfortranarray(rank_matrix[order])
+    for subject_index, subject in enumerate(subjects):
+        scores = score_matrix[:, subject_index]
+        sorted_scores = np.sort(scores)
+        # 描述性统计、区分度与群体结构性指标一次完成，首尾均值与核心密度直接基于排序结果
+        group_stats[subject] = core.calculate_score_stats(scores, data['fullMarks'][subject],
+                                                          sorted_scores=sorted_scores)
         group_stats[subject]['_scores_cache'] = scores  # 用于后续群体结构分析
+        group_stats[subject]['_sorted_cache'] = sorted_scores  # 排序结果只计算一次，供各项分位类指标复用
 
-    total_scores_group = [s['totalScore'] for s in all_students_flat]
-    group_stats['totalScore'] = core.calculate_descriptive_stats(total_scores_group, total_full_marks)
-    group_stats['totalScore']['discriminationIndex'] = core.calculate_discrimination_index(total_scores_group,
-                                                                                           total_full_marks)
-
-    # 群体结构性指标分析
-    core.calculate_advanced_group_metrics(total_scores_group, group_stats['totalScore'])
-    for subject in subjects:
-        core.calculate_advanced_group_metrics(group_stats[subject]['_scores_cache'], group_stats[subject])
-
-    # 学科间相关性矩阵
-    correlation_matrix = {
-        s1: {
-            s2: (1.0 if s1 == s2 else core.calculate_correlation(
-                [s['scores'].get(s1, 0) for s in all_students_flat],
-                [s['scores'].get(s2, 0) for s in all_students_flat]
-            )) for s2 in subjects
-        } for s1 in subjects
-    }
-    group_stats['correlationMatrix'] = correlation_matrix
+    total_scores_group = rank_totals[order]
+    total_sorted_group = np.sort(total_scores_group)
+    group_stats['totalScore'] = core.calculate_score_stats(total_scores_group, total_full_marks,
+                                                           sorted_scores=total_sorted_group)
+
+    # 学科间相关性矩阵（一次 np.corrcoef 计算所有学科对）
+    group_stats['correlationMatrix'] = core.calculate_correlation_matrix(
+        {subject: group_stats[subject]['_scores_cache'] for subject in subjects}
+    )
 
     # 初始化分析结果结构
     analysis_results = {
@@ -134,153 +404,40 @@ def perform_analysis(data: Dict, student_history_map: Optional[Dict[str, Any]] =
     # -----------------------------
     # 班级与学生级别分析
     # -----------------------------
+    # 各班学生、分数矩阵与总分直接按行号从年级数据中切出，不再逐科重新提取分数
+    rows_by_table = _group_by_table(all_students_flat)
+    class_students_per_table = []
     for table_data in data['tables']:
-        class_students_data = [s for s in all_students_flat if s['tableName'] == table_data['tableName']]
-        if not class_students_data:
+        class_rows = rows_by_table.get(table_data['tableName'])
+        if not class_rows:
             continue
-
-        table_stats = {}
-        class_scores_by_subject = {}
-
-        # 班级各科统计指标
-        for subject in subjects:
-            scores = [s['scores'].get(subject, 0) for s in class_students_data]
-            class_scores_by_subject[subject] = scores
-            table_stats[subject] = core.calculate_descriptive_stats(scores, data['fullMarks'][subject])
-            table_stats[subject]['discriminationIndex'] = core.calculate_discrimination_index(scores, data['fullMarks'][
-                subject])
-            core.calculate_advanced_group_metrics(scores, table_stats[subject])
-
-        # 班级总分统计指标
-        total_scores_table = [s['totalScore'] for s in class_students_data]
-        table_stats['totalScore'] = core.calculate_descriptive_stats(total_scores_table, total_full_marks)
-        table_stats['totalScore']['discriminationIndex'] = core.calculate_discrimination_index(total_scores_table,
-                                                                                               total_full_marks)
-        core.calculate_advanced_group_metrics(total_scores_table, table_stats['totalScore'])
-
-        # 班级 VS 年级横向指标
-        core.calculate_class_vs_group_metrics(table_stats, group_stats)
-
-        # -----------------------
-        # 学生画像与个体指标
-        # -----------------------
-        students_results_list = []
-        all_table_t_scores = []
-
-        for student_data in class_students_data:
-            student_name = student_data['studentName']
-            z_scores, t_scores, score_rates = {}, {}, {}
-            subject_t_score_tuples = []
-
-            # 计算每科 T 分、Z 分、得分率
-            for subject, raw_score in student_data['scores'].items():
-                gs_subj = group_stats.get(subject, {})
-                mean = gs_subj.get('mean', 0)
-                std_dev = gs_subj.get('stdDev', 0)
-                fm_subj = data['fullMarks'].get(subject, 100)
-
-                # 准确性与清晰度优化：分开计算 Z 分和 T 分
-                if std_dev != 0:
-                    z_score = (raw_score - mean) / std_dev
-                    t_score = 50.0 + 10 * z_score
-                else:
-                    z_score = 0.0
-                    t_score = 50.0
-
-                z_scores[subject] = round(z_score, 3)
-                t_scores[subject] = round(t_score, 2)
-                score_rates[subject] = round(raw_score / fm_subj, 3) if fm_subj != 0 else 0.0
-                subject_t_score_tuples.append((subject, t_score))
-
-            # 总分 T 分
-            total_score_mean = group_stats['totalScore'].get('mean', 0)
-            total_score_std_dev = group_stats['totalScore'].get('stdDev', 0)
-            total_t_score = 50.0 + 10 * ((student_data[
-                                              'totalScore'] - total_score_mean) / total_score_std_dev) if total_score_std_dev != 0 else 50.0
-            t_scores['totalScore'] = round(total_t_score, 2)
-
-            # 画像指标：强弱科、T分波动、画像类型
-            student_t_scores = [t for _, t in subject_t_score_tuples]
-            all_table_t_scores.extend(student_t_scores)
-            sorted_by_t = sorted(subject_t_score_tuples, key=lambda x: x[1], reverse=True)
-
-            student_report = {
-                "studentName": student_name,
-                "tableName": student_data['tableName'],
-                "totalScore": round(student_data['totalScore'], 2),
-                "classRank": student_ranks[student_name]['totalScore']['classRank'],
-                "gradeRank": student_ranks[student_name]['totalScore']['gradeRank'],
-                "ranks": student_ranks.get(student_name, {}),
-                "scores": {
-                    "rawScores": student_data['scores'],
-                    "zScores": z_scores,
-                    "tScores": t_scores,
-                    "scoreRates": score_rates
-                },
-                "metrics": {
-                    "imbalanceIndex": round(statistics.pstdev(student_t_scores), 2) if len(
-                        student_t_scores) > 1 else 0.0,
-                    "strengthSubjects": [{"subject": s[0], "tScore": round(s[1], 2)} for s in
-                                         sorted_by_t[:1]] if sorted_by_t else [],
-                    "weaknessSubjects": [{"subject": s[0], "tScore": round(s[1], 2)} for s in
-                                         sorted_by_t[-1:]] if sorted_by_t else [],
-                }
-            }
-
-            # 补充：距离及格线/优秀线的差值
-            PASS_THRESHOLD, EXCELLENT_THRESHOLD = 0.60, 0.85
-            pass_score_line = total_full_marks * PASS_THRESHOLD
-            excellent_score_line = total_full_marks * EXCELLENT_THRESHOLD
-            if student_report['totalScore'] < pass_score_line:
-                student_report["metrics"]["pointsToPass"] = round(pass_score_line - student_report['totalScore'], 2)
-            if student_report['totalScore'] < excellent_score_line:
-                student_report["metrics"]["pointsToExcellent"] = round(
-                    excellent_score_line - student_report['totalScore'], 2)
-
-            # 学生画像标签识别
-            imbalance_index = student_report["metrics"]["imbalanceIndex"]
-            profile = "潜力提升型"
-            if total_t_score >= 62 and imbalance_index >= 12:
-                profile = "拔尖偏科型"
-            elif total_t_score >= 62 and imbalance_index < 12:
-                profile = "拔尖均衡型"
-            elif 55 <= total_t_score < 62 and imbalance_index < 8:
-                profile = "稳健发展型"
-            elif 45 <= total_t_score < 55:
-                profile = "中坚力量型"
-            elif total_t_score < 45 and imbalance_index >= 12:
-                profile = "短板制约型"
-            elif total_t_score < 45 and imbalance_index < 12:
-                profile = "基础薄弱型"
-            student_report["profile"] = profile
-
-            # 个体贡献度 + 专业化指数
-            core.calculate_advanced_student_metrics(student_report, class_scores_by_subject)
-
-            # 历史趋势分析（如提供）
-            if student_history_map and student_name in student_history_map:
-                core.analyze_historical_trends(student_report, student_history_map[student_name])
-                all_exams = student_history_map[student_name].get("allExams", [])
-                if len(all_exams) >= 2:
-                    historical_ranks = [exam.get('studentScores', [{}])[0].get('gradePercentileRank') for exam in
-                                        all_exams]
-                    rank_slope = core.analyze_trend_slope(historical_ranks)
-                    student_report["metrics"].setdefault("history", {})["gradePercentileRankSlope"] = rank_slope
-
-            students_results_list.append(student_report)
-
-        # 班级 T 分 Gini 系数
-        table_stats["tScoreGiniCoefficient"] = core.calculate_gini(all_table_t_scores)
-
-        analysis_results["tables"].append({
-            "tableName": table_data['tableName'],
-            "tableStats": table_stats,
-            "students": sorted(students_results_list, key=lambda x: x.get('classRank', 999))
-        })
+        class_students_per_table.append((
+            table_data,
+            [all_students_flat[row] for row in class_rows],
+            score_matrix[class_rows],
+            total_scores_group[class_rows]
+        ))
+
+    # 各学科标准化所需的年级均值、标准差与满分向量（与 subjects 顺序一致）
+    subject_vectors = (
+        np.array([group_stats[subject]['mean'] for subject in subjects], dtype=np.float64),
+        np.array([group_stats[subject]['stdDev'] for subject in subjects], dtype=np.float64),
+        np.array([data['fullMarks'].get(subject, 100) for subject in subjects], dtype=np.float64),
+    )
+
+    # 逐班完成分析（统计指标 + 学生个体指标），结果按原班级顺序排列
+    history_rank_slopes = _history_rank_slopes(student_history_map) if student_history_map else {}
+    analysis_results["tables"] = [
+        _analyze_table(entry, subjects=subjects, full_marks=data['fullMarks'], total_full_marks=total_full_marks,
+                       group_stats=group_stats, student_ranks=student_ranks,
+                       student_history_map=student_history_map, history_rank_slopes=history_rank_slopes,
+                       subject_vectors=subject_vectors)
+        for entry in class_students_per_table
+    ]
 
     # 清理临时缓存字段
     for subject in list(group_stats.keys()):
-        if '_scores_cache' in group_stats[subject]:
-            del group_stats[subject]['_scores_cache']
+        group_stats[subject].pop('_scores_cache', None)
+        group_stats[subject].pop('_sorted_cache', None)
 
     return analysis_results
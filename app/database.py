@@ -1,13 +1,24 @@
 # app/database.py
+import json
+import os
+from functools import partial
+
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, raiseload
 
 DATABASE_URL = "sqlite:///./school_analysis_compact.db"
 
+# 严格加载模式：开启后热点查询中未显式预加载的关系一经访问即抛出异常，防止悄然引入 N+1 查询；
+# 设置环境变量 STRICT_LOADING=0 可关闭（未声明的关系退回为普通懒加载）
+STRICT_LOADING = os.getenv("STRICT_LOADING", "1") != "0"
+
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False},
+    # JSON 列（如分析报告全文）使用紧凑分隔符并直接写入中文，避免逐字符 \uXXXX 转义，
+    # 减小序列化耗时与存储体积；读取时标准 json 解析两种格式均兼容
+    json_serializer=partial(json.dumps, ensure_ascii=False, separators=(",", ":"))
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -15,6 +26,18 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def strict_loading_options(*options):
+    """
+    在显式加载选项之后追加 raiseload('*')，作为防止 N+1 查询的安全网。
+
+    :param options: 查询已显式声明的加载选项（如 joinedload(...)）
+    :return: 可直接传给 Query.options() 的加载选项元组
+    """
+    if STRICT_LOADING:
+        return options + (raiseload('*'),)
+    return options
+
+
 def get_db():
     db = SessionLocal()
     try:
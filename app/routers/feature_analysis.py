@@ -1,16 +1,33 @@
 # app/routers/feature_analysis.py
 
+import base64
+import json
 import re
-from typing import Optional
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, status
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import String, and_, func, or_, type_coerce
+from sqlalchemy.orm import Session, defer, joinedload, load_only, selectinload
 
 from app import models, schemas
 from app.analysis_engine.facade import AnalysisEngine
-from app.database import get_db
+from app.database import get_db, strict_loading_options
 from app.services import report_runner
 
+# 旧版报告的源描述为 "Scope: <level>, IDs: [<id>, ...]" 文本，用于一次性解析其中的分析范围层级与 ID 列表
+SOURCE_DESC_RE = re.compile(r"Scope: (\w+).*?IDs: \[([\d,\s]*)\]")
+
+# 已完成报告的计算结果缓存 {(报告ID, 接口, 参数): 结果}：报告完成后数据不再变化，
+# 按最近使用淘汰，删除或重试报告时显式失效
+REPORT_RESULT_CACHE_SIZE = 256
+_report_result_cache: "OrderedDict[Tuple, Any]" = OrderedDict()
+# 分析引擎缓存 {(报告ID, 更新时间): AnalysisEngine}：引擎持有完整报告数据，容量保持较小以控制内存
+REPORT_ENGINE_CACHE_SIZE = 16
+_report_engine_cache: "OrderedDict[Tuple, AnalysisEngine]" = OrderedDict()
+_report_cache_lock = threading.Lock()
+
 router = APIRouter(
     tags=["学情分析 (Feature Analysis)"],
 )
@@ -41,7 +58,8 @@ def handle_submit_analysis(
     new_report = models.AnalysisReport(
         report_name=request.report_name,
         exam_id=request.exam_id,
-        source_description=f"Scope: {request.scope.level}, IDs: {request.scope.ids}",
+        # 以 JSON 记录分析范围 {"level": ..., "ids": [...]}，重试时直接反序列化恢复
+        source_description=request.scope.model_dump_json(),
         status="processing",
         report_type="single"
     )
@@ -69,21 +87,29 @@ def handle_create_comparison_report(
     """
     基于多个已完成的单场考试报告，生成一份对比分析报告。
     """
-    source_reports = db.query(models.AnalysisReport).filter(
-        models.AnalysisReport.id.in_(request_data.report_ids),
+    # 去除重复ID（保留原顺序），避免同一报告与自身对比
+    report_ids = list(dict.fromkeys(request_data.report_ids))
+    if len(report_ids) < 2:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="对比分析至少需要 2 个不同的源报告ID。")
+
+    # 只查询满足条件的报告ID，无需加载完整报告对象
+    existing_ids = {report_id for report_id, in db.query(models.AnalysisReport.id).filter(
+        models.AnalysisReport.id.in_(report_ids),
         models.AnalysisReport.status == "completed",
         models.AnalysisReport.report_type == "single"
-    ).all()
+    )}
 
-    if len(source_reports) != len(request_data.report_ids):
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="一个或多个源报告ID不存在或尚未分析完成。")
+    missing_ids = [report_id for report_id in report_ids if report_id not in existing_ids]
+    if missing_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"一个或多个源报告ID不存在或尚未分析完成: {missing_ids}")
 
-    report_name = request_data.report_name or f"对 {len(source_reports)} 场考试的对比分析"
+    report_name = request_data.report_name or f"对 {len(existing_ids)} 场考试的对比分析"
 
     new_comparison_report = models.AnalysisReport(
         report_name=report_name,
         status="processing",
-        source_description=f"Comparing reports: {str(request_data.report_ids)}",
+        source_description=f"Comparing reports: {str(report_ids)}",
         report_type="comparison"
     )
     db.add(new_comparison_report)
@@ -93,12 +119,26 @@ def handle_create_comparison_report(
     background_tasks.add_task(
         report_runner.run_comparison_analysis_task,
         comparison_report_id=new_comparison_report.id,
-        source_report_ids=request_data.report_ids
+        source_report_ids=report_ids
     )
 
     return {"message": "对比分析任务已创建。", "report_id": new_comparison_report.id}
 
 
+def _encode_report_cursor(created_at_raw: str, report_id: int) -> str:
+    """工具函数：将报告列表的翻页位置 (创建时间原始文本, 报告ID) 编码为不透明游标。"""
+    return base64.urlsafe_b64encode(f"{created_at_raw}|{report_id}".encode()).decode()
+
+
+def _decode_report_cursor(cursor: str) -> Tuple[str, int]:
+    """工具函数：解析翻页游标，返回 (创建时间原始文本, 报告ID)；游标无效时返回 400。"""
+    try:
+        created_at_raw, report_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return created_at_raw, int(report_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的翻页游标")
+
+
 @router.get("/reports", response_model=schemas.PaginatedAnalysisReportResponse, summary="获取分析报告列表")
 def get_all_reports(
         page: int = Query(1, gt=0, description="页码"),
@@ -106,10 +146,13 @@ def get_all_reports(
         query: Optional[str] = Query(None, description="报告名称搜索关键字"),
         status: Optional[str] = Query(None, description="按状态筛选 (processing, completed, failed)"),
         report_type: Optional[str] = Query(None, description="按报告类型筛选 (single, comparison)"),
+        cursor: Optional[str] = Query(None, description="翻页游标（上一页返回的 nextCursor），提供时忽略 page 且不返回总数"),
         db: Session = Depends(get_db)
 ):
     """
     分页查询分析报告列表，支持名称模糊搜索、状态筛选、类型筛选。
+
+    支持两种翻页方式：按 page 页码（OFFSET）跳页，或传入上一页返回的 nextCursor 顺序翻页（深翻页时更快）。
     """
     base_query = db.query(models.AnalysisReport)
     if query:
@@ -119,11 +162,48 @@ def get_all_reports(
     if report_type:
         base_query = base_query.filter(models.AnalysisReport.report_type == report_type)
 
-    total = base_query.count()
-    reports = base_query.order_by(models.AnalysisReport.created_at.desc()).offset((page - 1) * page_size).limit(
-        page_size).all()
-
-    return {"items": reports, "total": total, "page": page, "pageSize": page_size}
+    # 按 (创建时间, ID) 倒序排列，ID 作为同一时间的确定性次序，二者共同构成游标翻页的位置
+    order_columns = (models.AnalysisReport.created_at.desc(), models.AnalysisReport.id.desc())
+    # 创建时间的库内原始文本：游标中保存并按原格式比较，避免与绑定参数的时间格式不一致
+    created_at_raw = type_coerce(models.AnalysisReport.created_at, String).label('created_at_raw')
+    # 列表只读取元数据列，报告正文等大字段不从数据库取出
+    page_query = base_query.options(
+        load_only(models.AnalysisReport.id, models.AnalysisReport.report_name, models.AnalysisReport.exam_id,
+                  models.AnalysisReport.status, models.AnalysisReport.report_type,
+                  models.AnalysisReport.ai_analysis_status, models.AnalysisReport.error_message,
+                  models.AnalysisReport.created_at, models.AnalysisReport.updated_at),
+        selectinload(models.AnalysisReport.exam)
+    ).add_columns(created_at_raw)
+
+    if cursor is not None:
+        # 游标翻页：直接从上一页最后一条报告 (创建时间, ID) 之后继续读取，无需像 OFFSET 那样扫描并丢弃前面的行；
+        # 游标自带位置信息，不依赖游标对应的报告仍然存在；为保持翻页开销恒定，不统计总数
+        cursor_created_at, cursor_id = _decode_report_cursor(cursor)
+        cursor_created_at = type_coerce(cursor_created_at, String)
+        rows = page_query.filter(or_(
+            models.AnalysisReport.created_at < cursor_created_at,
+            and_(models.AnalysisReport.created_at == cursor_created_at, models.AnalysisReport.id < cursor_id)
+        )).order_by(*order_columns).limit(page_size + 1).all()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        total = None
+    else:
+        # 通过窗口函数 COUNT(*) OVER () 在取当前页的同一查询中获得筛选后的总数，省去单独的 COUNT 往返
+        rows = page_query.add_columns(func.count().over().label('total')).order_by(
+            *order_columns).offset((page - 1) * page_size).limit(page_size).all()
+
+        if rows:
+            total = rows[0].total
+        elif page > 1:
+            # 页码超出范围时当前页无数据行，需单独统计总数
+            total = db.query(func.count()).select_from(base_query.subquery()).scalar()
+        else:
+            total = 0
+        has_more = (page - 1) * page_size + len(rows) < total
+
+    reports = [row[0] for row in rows]
+    next_cursor = _encode_report_cursor(rows[-1].created_at_raw, reports[-1].id) if has_more else None
+    return {"items": reports, "total": total, "page": page, "pageSize": page_size, "nextCursor": next_cursor}
 
 
 # 【修改处】将 response_model 从不存在的 AnalysisReportDetail 改为 AnalysisReport
@@ -134,25 +214,106 @@ def get_report_details(report_id: int, db: Session = Depends(get_db)):
     获取指定分析报告的完整内容，包括元数据与分析结构体。
     前端可以通过轮询此接口，检查 `ai_analysis_status` 和 `ai_analysis_cache` 字段来获取AI分析结果。
     """
-    report = db.query(models.AnalysisReport).options(joinedload(models.AnalysisReport.exam)).filter(
-        models.AnalysisReport.id == report_id).first()
+    report = db.query(models.AnalysisReport).options(
+        *strict_loading_options(joinedload(models.AnalysisReport.exam))
+    ).filter(models.AnalysisReport.id == report_id).first()
     if not report:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="报告未找到")
     return report
 
 
-def get_report_from_db(report_id: int, db: Session) -> models.AnalysisReport:
+def _get_completed_report(report_id: int, db: Session) -> models.AnalysisReport:
     """
-    工具函数：从数据库中读取报告，并验证其已完成状态与数据存在性。
+    工具函数：仅读取报告元数据（不加载完整报告 JSON），并验证报告存在且已分析完成。
+
+    :param report_id: 报告ID
     """
-    report = db.query(models.AnalysisReport).filter(models.AnalysisReport.id == report_id).first()
+    report = db.query(models.AnalysisReport).options(defer(models.AnalysisReport.full_report_data)).filter(
+        models.AnalysisReport.id == report_id).first()
     if not report:
         raise HTTPException(status_code=404, detail="报告未找到")
     if report.status != 'completed':
         raise HTTPException(status_code=400, detail=f"报告状态为 '{report.status}'，尚未分析完成。")
+    return report
+
+
+def _report_cache_token(report: models.AnalysisReport) -> Tuple:
+    """工具函数：返回报告缓存的有效性键 (报告ID, 更新时间)，报告被更新后旧缓存自然失效。"""
+    return report.id, report.updated_at or report.created_at
+
+
+def _build_report_engine(report: models.AnalysisReport) -> AnalysisEngine:
+    """
+    工具函数：返回已验证报告对应的分析引擎，优先使用进程内缓存，未命中时才读取并解析完整的报告 JSON。
+
+    :param report: 已通过 `_get_completed_report` 验证的报告
+    """
+    key = _report_cache_token(report)
+    with _report_cache_lock:
+        engine = _report_engine_cache.get(key)
+        if engine is not None:
+            _report_engine_cache.move_to_end(key)
+            return engine
+
     if not report.full_report_data:
         raise HTTPException(status_code=404, detail="报告数据为空。")
-    return report
+    engine = AnalysisEngine(report.full_report_data)
+
+    with _report_cache_lock:
+        _report_engine_cache[key] = engine
+        while len(_report_engine_cache) > REPORT_ENGINE_CACHE_SIZE:
+            _report_engine_cache.popitem(last=False)
+    return engine
+
+
+def get_report_engine(report_id: int, db: Session) -> AnalysisEngine:
+    """
+    工具函数：读取报告并验证其已完成状态与数据存在性，返回基于报告数据的分析引擎。
+
+    引擎按 (报告ID, 更新时间) 缓存在进程内：命中时只查询报告元数据，无需再读取并解析完整的报告 JSON；
+    报告被更新后更新时间随之变化，旧引擎自然失效。
+    """
+    return _build_report_engine(_get_completed_report(report_id, db))
+
+
+def _get_cached_report_result(report_id: int, cache_key: Tuple, db: Session,
+                              compute: Callable[[AnalysisEngine], Any]) -> Any:
+    """
+    工具函数：读取报告派生结果的缓存，未命中时通过分析引擎计算并写入缓存（结果为 None 时不缓存）。
+
+    每次请求都会先查询报告元数据并校验完成状态，缓存键包含报告更新时间，
+    因此在其他进程或脚本中修改报告后不会继续返回旧结果。
+
+    :param report_id: 报告ID
+    :param cache_key: 接口及参数组成的缓存键（不含报告ID）
+    :param compute: 基于分析引擎计算结果的函数
+    """
+    report = _get_completed_report(report_id, db)
+    key = _report_cache_token(report) + cache_key
+    with _report_cache_lock:
+        result = _report_result_cache.get(key)
+        if result is not None:
+            _report_result_cache.move_to_end(key)
+            return result
+
+    result = compute(_build_report_engine(report))
+    if result is None:
+        # 未找到的班级等查询结果不缓存，避免无效键挤占缓存容量
+        return None
+
+    with _report_cache_lock:
+        _report_result_cache[key] = result
+        while len(_report_result_cache) > REPORT_RESULT_CACHE_SIZE:
+            _report_result_cache.popitem(last=False)
+    return result
+
+
+def _invalidate_report_cache(report_id: int) -> None:
+    """工具函数：清除指定报告的分析引擎与全部缓存结果。"""
+    with _report_cache_lock:
+        for cache in (_report_engine_cache, _report_result_cache):
+            for key in [key for key in cache if key[0] == report_id]:
+                del cache[key]
 
 
 @router.get("/reports/{report_id}/group-stats", summary="获取报告的整体统计数据")
@@ -160,9 +321,7 @@ def get_report_group_stats(report_id: int, db: Session = Depends(get_db)):
     """
     从报告中提取整体（年级/全体）统计数据结构。
     """
-    report = get_report_from_db(report_id, db)
-    engine = AnalysisEngine(report.full_report_data)
-    return engine.get_group_stats()
+    return _get_cached_report_result(report_id, ("group-stats",), db, AnalysisEngine.get_group_stats)
 
 
 @router.get("/reports/{report_id}/class/{class_name}", summary="获取报告中指定班级的报告")
@@ -170,9 +329,8 @@ def get_report_class_details(report_id: int, class_name: str, db: Session = Depe
     """
     获取分析报告中某个班级的详细结构数据。
     """
-    report = get_report_from_db(report_id, db)
-    engine = AnalysisEngine(report.full_report_data)
-    class_report = engine.get_class_report(class_name)
+    class_report = _get_cached_report_result(report_id, ("class", class_name), db,
+                                             lambda engine: engine.get_class_report(class_name))
     if not class_report:
         raise HTTPException(status_code=404, detail=f"在报告中未找到班级 '{class_name}'")
     return class_report
@@ -183,9 +341,7 @@ def get_report_student_details(report_id: int, student_name: str, db: Session =
     """
     获取分析报告中某位学生的详细结构数据。
     """
-    report = get_report_from_db(report_id, db)
-    engine = AnalysisEngine(report.full_report_data)
-    student_report = engine.get_student_report(student_name)
+    student_report = get_report_engine(report_id, db).get_student_report(student_name)
     if not student_report:
         raise HTTPException(status_code=404, detail=f"在报告中未找到学生 '{student_name}'")
     return student_report
@@ -195,11 +351,9 @@ def get_report_student_details(report_id: int, student_name: str, db: Session =
 def get_report_chart_data(report_id: int, db: Session = Depends(get_db)):
     """
     动态生成并返回图表所需的结构化数据。
-    图表数据不存数据库，前端每次访问时实时生成。
+    图表数据不存数据库，首次访问时实时生成并缓存在进程内。
     """
-    report = get_report_from_db(report_id, db)
-    engine = AnalysisEngine(report.full_report_data)
-    return engine.get_chart_data()
+    return _get_cached_report_result(report_id, ("charts",), db, AnalysisEngine.get_chart_data)
 
 
 @router.delete("/reports/{report_id}", status_code=status.HTTP_204_NO_CONTENT, summary="删除分析报告")
@@ -212,9 +366,32 @@ def delete_report(report_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="报告未找到")
     db.delete(report)
     db.commit()
+    _invalidate_report_cache(report_id)
     return
 
 
+def _parse_source_scope(source_description: str) -> Tuple[str, List[int]]:
+    """
+    工具函数：从报告源描述中恢复分析范围。
+
+    新报告的源描述为 JSON {"level": ..., "ids": [...]}，直接反序列化；
+    旧报告为 "Scope: <level>, IDs: [...]" 文本，回退到正则解析。
+
+    :return: (scope_level, scope_ids)
+    """
+    if source_description.startswith('{'):
+        scope = schemas.AnalysisScope.model_validate(json.loads(source_description))
+        return scope.level, scope.ids
+
+    source_match = SOURCE_DESC_RE.search(source_description)
+    if not source_match:
+        raise ValueError("无法从描述中解析出原始分析范围")
+    scope_level, scope_ids_str = source_match.groups()
+    scope_ids = [int(sid.strip()) for sid in scope_ids_str.split(',') if
+                 sid.strip().isdigit()] if scope_ids_str else []
+    return scope_level, scope_ids
+
+
 @router.post("/reports/{report_id}/retry", status_code=status.HTTP_202_ACCEPTED, summary="重试失败的分析任务")
 def retry_report_analysis(report_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
@@ -229,20 +406,14 @@ def retry_report_analysis(report_id: int, background_tasks: BackgroundTasks, db:
         raise HTTPException(status_code=400, detail="报告缺少源描述，无法重试")
 
     try:
-        scope_level_match = re.search(r"Scope: (\w+)", report.source_description)
-        scope_ids_match = re.search(r"IDs: \[([\d,\s]*)\]", report.source_description)
-        if not scope_level_match or not scope_ids_match:
-            raise ValueError("无法从描述中解析出原始分析范围")
-        scope_level = scope_level_match.group(1)
-        scope_ids_str = scope_ids_match.group(1)
-        scope_ids = [int(sid.strip()) for sid in scope_ids_str.split(',') if
-                     sid.strip().isdigit()] if scope_ids_str else []
+        scope_level, scope_ids = _parse_source_scope(report.source_description)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"解析重试参数失败: {e}")
 
     report.status = "processing"
     report.error_message = None
     db.commit()
+    _invalidate_report_cache(report.id)
 
     background_tasks.add_task(
         report_runner.run_single_exam_analysis_task,
@@ -1,11 +1,12 @@
 # app/feature_classes.py
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session, joinedload
 from typing import List
 
 from app import models, schemas
-from app.database import get_db
+from app.database import get_db, strict_loading_options
 
 router = APIRouter(tags=["班级管理"])
 
@@ -95,9 +96,17 @@ def get_class_tree(db: Session = Depends(get_db)):
     - 每个班级附带激活学生数量
     """
     grades = db.query(models.Grade).options(
-        joinedload(models.Grade.classes).joinedload(models.Class.students)
+        *strict_loading_options(joinedload(models.Grade.classes))
     ).order_by(models.Grade.name).all()
 
+    # 一次分组聚合统计各班激活学生数量，无需加载学生行
+    active_counts = dict(
+        db.query(models.Student.class_id, func.count(models.Student.id))
+        .filter(models.Student.is_active == True)
+        .group_by(models.Student.class_id)
+        .all()
+    )
+
     result = []
     for grade in grades:
         grade_data = schemas.GradeForTree(id=grade.id, name=grade.name, classes=[])
@@ -106,8 +115,8 @@ def get_class_tree(db: Session = Depends(get_db)):
         sorted_classes = sorted(grade.classes, key=lambda c: c.name)
 
         for cls in sorted_classes:
-            # 统计该班级中处于激活状态的学生数量
-            active_student_count = sum(1 for s in cls.students if s.is_active)
+            # 该班级中处于激活状态的学生数量
+            active_student_count = active_counts.get(cls.id, 0)
 
             class_data = schemas.ClassForTree(
                 id=cls.id,
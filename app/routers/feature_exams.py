@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session, joinedload
 from typing import List
 
 from app import models, schemas
-from app.database import get_db
+from app.database import get_db, strict_loading_options
 
 router = APIRouter(tags=["考试与学科管理"])
 
@@ -74,7 +74,7 @@ def handle_get_exam_details(exam_id: int, db: Session = Depends(get_db)):
     获取考试详情，包括所有绑定的科目及其满分。
     """
     exam = db.query(models.Exam).options(
-        joinedload(models.Exam.exam_subjects).joinedload(models.ExamSubject.subject)
+        *strict_loading_options(joinedload(models.Exam.exam_subjects).joinedload(models.ExamSubject.subject))
     ).filter(models.Exam.id == exam_id).first()
 
     if not exam:
@@ -1,14 +1,14 @@
 # app/feature_students.py
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import true
+from sqlalchemy.orm import Session, joinedload, contains_eager
 from sqlalchemy.exc import IntegrityError
 from typing import List
-from datetime import date
 from sqlalchemy.sql.functions import func
 
 from app import models, schemas
-from app.database import get_db
+from app.database import get_db, strict_loading_options
 
 # 创建路由器，归类到“学生管理”模块
 router = APIRouter(tags=["学生管理"])
@@ -117,6 +117,97 @@ def batch_update_student_status(db: Session, update_info: schemas.StudentBatchSt
     return {"message": f"成功为 {len(update_info.student_ids)} 名学生更新了在读状态。"}
 
 
+def _query_performance_records_sqlite(db: Session, student_id: int) -> List[schemas.PerformanceRecordSchema]:
+    """
+    借助 SQLite JSON1 的 json_each 在数据库中展开报告的 tables -> students 并筛选指定学生，
+    只返回匹配的成绩字段，无需把整份报告 JSON 读入 Python 逐层查找。
+
+    :param db: 数据库会话
+    :param student_id: 学生ID
+    :return: 按考试日期升序排列的表现记录列表
+    """
+    tables = func.json_each(models.AnalysisReport.full_report_data, '$.tables').table_valued('value').alias('tables')
+    students = func.json_each(tables.c.value, '$.students').table_valued('value').alias('students')
+    student_record = students.c.value
+
+    rows = db.query(
+        models.AnalysisReport.id,
+        models.AnalysisReport.exam_id,
+        models.Exam.name,
+        models.Exam.exam_date,
+        func.json_extract(student_record, '$.totalScore'),
+        func.json_extract(student_record, '$.classRank'),
+        func.json_extract(student_record, '$.gradeRank')
+    ).select_from(models.AnalysisReport).join(models.AnalysisReport.exam).join(tables, true()).join(
+        students, true()
+    ).filter(
+        models.AnalysisReport.status == "completed",
+        models.AnalysisReport.report_type == "single",
+        func.json_extract(student_record, '$.studentId') == student_id
+    ).order_by(models.Exam.exam_date, models.AnalysisReport.id).all()
+
+    performance_records = []
+    last_report_id = None
+    for report_id, exam_id, exam_name, exam_date, total_score, class_rank, grade_rank in rows:
+        # 同一报告只取第一条匹配记录
+        if report_id == last_report_id:
+            continue
+        last_report_id = report_id
+        performance_records.append(schemas.PerformanceRecordSchema(
+            exam_id=exam_id,
+            exam_name=exam_name,
+            exam_date=exam_date,
+            total_score=total_score,
+            class_rank=class_rank,
+            grade_rank=grade_rank
+        ))
+    return performance_records
+
+
+def _scan_performance_records(db: Session, student_id: int) -> List[schemas.PerformanceRecordSchema]:
+    """
+    通用实现：读取所有已完成的单场报告，在 Python 中逐层查找指定学生的成绩记录。
+    用于不支持 JSON1 表值函数的数据库。
+
+    :param db: 数据库会话
+    :param student_id: 学生ID
+    :return: 按考试日期升序排列的表现记录列表
+    """
+    # 联表考试：按考试日期在 SQL 中排序，并通过 contains_eager 复用联表结果填充 report.exam，避免逐报告懒加载
+    reports = db.query(models.AnalysisReport).join(models.AnalysisReport.exam).options(
+        contains_eager(models.AnalysisReport.exam)
+    ).filter(
+        models.AnalysisReport.status == "completed",
+        models.AnalysisReport.report_type == "single",
+        models.AnalysisReport.full_report_data.op('->')('tables').isnot(None)
+    ).order_by(models.Exam.exam_date, models.AnalysisReport.id).all()
+
+    performance_records = []
+
+    for report in reports:
+        # 遍历每份报告查找学生成绩记录
+        student_found_in_report = False
+        for table in report.full_report_data.get("tables", []):
+            for student_data in table.get("students", []):
+                if student_data.get("studentId") == student_id:
+                    performance_records.append(
+                        schemas.PerformanceRecordSchema(
+                            exam_id=report.exam_id,
+                            exam_name=report.exam.name,
+                            exam_date=report.exam.exam_date,
+                            total_score=student_data.get("totalScore"),
+                            class_rank=student_data.get("classRank"),
+                            grade_rank=student_data.get("gradeRank")
+                        )
+                    )
+                    student_found_in_report = True
+                    break
+            if student_found_in_report:
+                break
+
+    return performance_records
+
+
 # ------------------ 接口实现 ------------------
 
 @router.post("/", response_model=schemas.StudentSchema, summary="新增单个学生")
@@ -163,9 +254,11 @@ def handle_create_students_batch(batch_in: schemas.StudentCreateBatch, db: Sessi
             )
             new_students.append(new_student)
         db.add_all(new_students)
+        db.flush()
+        new_student_ids = [student.id for student in new_students]
         db.commit()
-        for student in new_students:
-            db.refresh(student)
+        # 提交后对象属性均已过期，用一次 IN 查询统一重新加载（同一身份映射中的对象随之刷新），替代逐个 refresh
+        db.query(models.Student).filter(models.Student.id.in_(new_student_ids)).all()
         return new_students
     except IntegrityError:
         db.rollback()
@@ -231,7 +324,7 @@ def get_student_details(student_id: int, db: Session = Depends(get_db)):
     获取学生的完整信息（包括班级和年级）。
     """
     student = db.query(models.Student).options(
-        joinedload(models.Student.class_).joinedload(models.Class.grade)
+        *strict_loading_options(joinedload(models.Student.class_).joinedload(models.Class.grade))
     ).filter(models.Student.id == student_id).first()
     if not student or not student.class_ or not student.class_.grade:
         raise HTTPException(status_code=404, detail="学生或其关联的班级/年级信息未找到")
@@ -253,37 +346,9 @@ def get_student_performance_history(student_id: int, db: Session = Depends(get_d
     """
     获取指定学生在多个报告中的总分、排名等历史表现记录。
     """
-    reports = db.query(models.AnalysisReport).filter(
-        models.AnalysisReport.status == "completed",
-        models.AnalysisReport.report_type == "single",
-        models.AnalysisReport.full_report_data.op('->')('tables').isnot(None)
-    ).all()
-
-    reports.sort(key=lambda r: r.exam.exam_date if r.exam else date.min)
-    performance_records = []
-
-    for report in reports:
-        if not report.exam:
-            continue
-
-        # 遍历每份报告查找学生成绩记录
-        student_found_in_report = False
-        for table in report.full_report_data.get("tables", []):
-            for student_data in table.get("students", []):
-                if student_data.get("studentId") == student_id:
-                    performance_records.append(
-                        schemas.PerformanceRecordSchema(
-                            exam_id=report.exam_id,
-                            exam_name=report.exam.name,
-                            exam_date=report.exam.exam_date,
-                            total_score=student_data.get("totalScore"),
-                            class_rank=student_data.get("classRank"),
-                            grade_rank=student_data.get("gradeRank")
-                        )
-                    )
-                    student_found_in_report = True
-                    break
-            if student_found_in_report:
-                break
+    if db.get_bind().dialect.name == "sqlite":
+        performance_records = _query_performance_records_sqlite(db, student_id)
+    else:
+        performance_records = _scan_performance_records(db, student_id)
 
     return {"records": performance_records}
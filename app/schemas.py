@@ -271,6 +271,25 @@ class ComparisonReportRequest(BaseModel):
     report_name: Optional[str] = None
 
 
+class AnalysisReportListItem(BaseModel):
+    """
+    分析报告列表项：仅包含元数据，不含报告正文、图表数据与 AI 分析结果等大字段
+    """
+    id: int
+    report_name: str
+    exam_id: Optional[int] = None
+    status: str
+    report_type: str
+    ai_analysis_status: str = Field(description="AI分析任务状态 (not_started, processing, completed, failed)")
+    error_message: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    exam: Optional[ExamSchema] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class AnalysisReport(BaseModel):
     """
     分析报告完整结构，用于 API 返回
@@ -297,7 +316,8 @@ class PaginatedAnalysisReportResponse(BaseModel):
     """
     分页分析报告返回模型
     """
-    items: List[AnalysisReport]
-    total: int
+    items: List[AnalysisReportListItem]
+    total: Optional[int] = Field(None, description="筛选后的报告总数；按游标翻页时不统计，为空")
     page: int
     pageSize: int
+    nextCursor: Optional[str] = Field(None, description="下一页游标，无更多数据时为空")
@@ -1,13 +1,35 @@
 # app/services/report_runner.py
 
-from typing import List
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload, load_only
 from app.database import SessionLocal
 from app.models import AnalysisReport
 from app.analysis_engine.facade import create_single_exam_report
 from app.services import ai_analyzer
 
 
+def _timeline_change(values: List) -> Optional[float]:
+    """
+    计算时间线中首个与最后一个有效值之差（末值 - 首值）。
+
+    单次遍历同时完成空值过滤与数值类型检查；存在非数值项或有效值不足时返回 None。
+
+    :param values: 按考试顺序排列的时间线数据，缺考为 None。
+    """
+    first = last = None
+    for value in values:
+        if value is None:
+            continue
+        if not isinstance(value, (int, float)):
+            return None
+        if first is None:
+            first = value
+        last = value
+    if first is None:
+        return None
+    return last - first
+
+
 def run_single_exam_analysis_task(report_id: int, scope_level: str, scope_ids: List[int]):
     """
     执行单场考试的后台分析任务。
@@ -52,7 +74,12 @@ def run_comparison_analysis_task(comparison_report_id: int, source_report_ids: L
     """
     db: Session = SessionLocal()
     try:
-        source_reports = db.query(AnalysisReport).filter(
+        # 只加载对比所需的列，并一次性联表取回考试，避免逐报告懒加载
+        source_reports = db.query(AnalysisReport).options(
+            load_only(AnalysisReport.id, AnalysisReport.exam_id, AnalysisReport.full_report_data,
+                      AnalysisReport.created_at),
+            joinedload(AnalysisReport.exam)
+        ).filter(
             AnalysisReport.id.in_(source_report_ids),
             AnalysisReport.report_type == "single",
             AnalysisReport.exam_id.isnot(None)
@@ -73,6 +100,10 @@ def run_comparison_analysis_task(comparison_report_id: int, source_report_ids: L
             "grade_trends": {}
         }
 
+        report_count = len(source_reports)
+        students_result = comparison_result["students"]
+        # 每位学生的时间线列表引用 {学生ID: (总分列表, 年级排名列表)}，循环内直接按下标写入
+        timelines_by_student = {}
         for idx, report in enumerate(source_reports):
             report_data = report.full_report_data
             if not report_data or 'tables' not in report_data:
@@ -83,29 +114,29 @@ def run_comparison_analysis_task(comparison_report_id: int, source_report_ids: L
                     student_id = student.get("studentId")
                     if not student_id: continue
 
-                    student_entry = comparison_result["students"].setdefault(student_id, {
-                        "studentName": student["studentName"],
-                        "tableName": student["tableName"],
-                        "timelines": {
-                            "totalScore": [None] * len(source_reports),
-                            "gradeRank": [None] * len(source_reports)
+                    timelines = timelines_by_student.get(student_id)
+                    if timelines is None:
+                        timelines = timelines_by_student[student_id] = ([None] * report_count, [None] * report_count)
+                        students_result[student_id] = {
+                            "studentName": student["studentName"],
+                            "tableName": student["tableName"],
+                            "timelines": {
+                                "totalScore": timelines[0],
+                                "gradeRank": timelines[1]
+                            }
                         }
-                    })
 
                     ranks = student.get("ranks", {}).get("totalScore", {})
-                    student_entry["timelines"]["totalScore"][idx] = student.get("totalScore")
-                    student_entry["timelines"]["gradeRank"][idx] = ranks.get("gradeRank")
-
-        for student_data in comparison_result["students"].values():
-            scores = [s for s in student_data["timelines"]["totalScore"] if s is not None]
-            ranks = [r for r in student_data["timelines"]["gradeRank"] if r is not None]
-
-            if len(scores) >= 2:
-                score_change = scores[-1] - scores[0] if all(isinstance(x, (int, float)) for x in scores) else None
-                rank_change = ranks[0] - ranks[-1] if all(isinstance(x, (int, float)) for x in ranks) else None
-                student_data["progress"] = {
-                    "score_change": score_change,
-                    "rank_change": rank_change
+                    timelines[0][idx] = student.get("totalScore")
+                    timelines[1][idx] = ranks.get("gradeRank")
+
+        for student_id, (score_timeline, rank_timeline) in timelines_by_student.items():
+            if report_count - score_timeline.count(None) >= 2:
+                rank_change = _timeline_change(rank_timeline)
+                students_result[student_id]["progress"] = {
+                    "score_change": _timeline_change(score_timeline),
+                    # 排名数值越小越好，故进步幅度为 首次排名 - 末次排名
+                    "rank_change": -rank_change if rank_change is not None else None
                 }
 
         comparison_report = db.query(AnalysisReport).filter(AnalysisReport.id == comparison_report_id).one()
@@ -9,6 +9,7 @@ build_exe_options = {
         "fastapi",
         "starlette",
         "sqlalchemy",
+        "numpy",
         "app"
     ],
     "includes": [